@@ -0,0 +1,36 @@
+"""
+gunicorn settings; gunicorn reads ./gunicorn.conf.py from the working dir.
+
+preload_app imports Django and builds the WSGI handler once, in the
+master. when_ready() then runs recipe_catalog.warmup before the first
+worker is forked, so every new or recycled worker starts with compiled
+templates and populated URL resolvers and only opens its own database
+connection. `python manage.py warmup --measure` compares both modes.
+GUNICORN_CMD_ARGS and WEB_CONCURRENCY still override anything here.
+"""
+import gc
+import os
+
+wsgi_app = 'recipe_project.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from recipe_catalog import warmup
+
+    for step, (result, ms) in warmup.warm_up().items():
+        server.log.info('warm-up %s: %s in %.1f ms', step, result, ms)
+    # Всё прогретое уходит из-под сборщика: его проходы не трогают общие
+    # с воркерами страницы памяти и не копируют их
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from recipe_catalog import warmup
+
+    if not worker.cfg.preload_app:
+        warmup.warm_up()
+    warmup.connect()
@@ -1,20 +1,171 @@
-from django.contrib import admin
-from .models import Ingredient, Recipe, RecipeIngredient
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models.functions import Substr
+from django.template.response import TemplateResponse
+from django.utils.text import Truncator
+
+from . import pricing, search
+from .forms import RepriceForm
+from .models import Ingredient, PriceHistory, Recipe, RecipeIngredient
+from .pagination import EstimatedCountPaginator
+
+DESCRIPTION_PREVIEW = 80
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """AutocompleteSelect that labels an already loaded choice without a query"""
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.loaded
+        if obj is None or [str(v) for v in value] != [str(obj.pk)]:
+            return super().optgroups(name, value, attr)
+        options = [] if self.is_required else [self.create_option(name, '', '', False, 0)]
+        label = self.choices.field.label_from_instance(obj)
+        options.append(self.create_option(name, obj.pk, label, True, len(options)))
+        return [(None, options, 0)]
+
+
+class RecipeIngredientForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.ingredient_id:
+            # Ингредиент уже загружен select_related: виджет не делает SELECT на строку
+            widget = self.fields['ingredient'].widget
+            getattr(widget, 'widget', widget).loaded = self.instance.ingredient
+
+
+class PaginatedInlineFormSet(forms.BaseInlineFormSet):
+    """Inline formset that shows one page of the existing rows"""
+    per_page = 20
+    page_number = 1
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = paginator.get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
 
 # Register your models here.
-class IngredientInline(admin.StackedInline):
+class IngredientInline(admin.TabularInline):
     model = RecipeIngredient
-    extra = 5
+    form = RecipeIngredientForm
+    formset = PaginatedInlineFormSet
+    autocomplete_fields = ['ingredient']
+    template = 'admin/recipe_catalog/recipe/paginated_tabular.html'
+    extra = 1
+    per_page = 20
+    page_param = 'links_page'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient', 'recipe').order_by(
+            'ingredient__name', 'pk'
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        # Форма сохраняется POST-ом на тот же URL: страница строк та же
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get(self.page_param)
+        formset.page_param = self.page_param
+        return formset
+
+
+class RecipeChangeList(ChangeList):
+    def get_queryset(self, request):
+        # Список не тянет полные описания, только их начало
+        return super().get_queryset(request).annotate(
+            description_start=Substr('description', 1, DESCRIPTION_PREVIEW + 1)
+        ).defer('description')
+
 
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientInline]
-    list_display = ('title', 'description')
+    list_display = ('title', 'short_description', 'author', 'total_price')
+    list_select_related = ('author',)
+    autocomplete_fields = ['author']
+    # Поиск идёт по полнотекстовому индексу, см. get_search_results
+    search_fields = ('title',)
+    search_help_text = 'Full-text search over title, description and ingredients'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return RecipeChangeList
+
+    @admin.display(description='Description')
+    def short_description(self, obj):
+        return Truncator(obj.description_start).chars(DESCRIPTION_PREVIEW)
+
+    def get_search_results(self, request, queryset, search_term):
+        return search.filter_recipes(queryset, search_term), False
 
 
 admin.site.register(Recipe, RecipeAdmin)
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'weight', 'weight_ready', 'price')
+    # Префиксный поиск идёт по индексу ingredient_name_ci_idx (Ingredient.Meta)
+    search_fields = ('^name',)
+    ordering = ('name', 'id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['reprice']
+
+    @admin.action(description='Reprice selected ingredients', permissions=['change'])
+    def reprice(self, request, queryset):
+        """Ask for a percentage, then apply it with one set-based UPDATE"""
+        form = RepriceForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            result = pricing.reprice_by_percent(
+                form.cleaned_data['percent'], queryset,
+                source=form.cleaned_data['source'] or f'admin: {request.user}',
+            )
+            self.message_user(
+                request,
+                f'{result.ingredients} ingredients repriced, {result.recipes} recipes '
+                f'updated in {result.seconds:.2f} s',
+                messages.SUCCESS,
+            )
+            return None
+        # Промежуточная страница: выбор (или select_across) уходит обратно в POST
+        return TemplateResponse(request, 'admin/recipe_catalog/ingredient/reprice.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Reprice ingredients',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        })
 
 
 admin.site.register(Ingredient, IngredientAdmin)
+
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('ingredient', 'old_price', 'new_price', 'changed_at', 'source')
+    list_select_related = ('ingredient',)
+    date_hierarchy = 'changed_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(PriceHistory, PriceHistoryAdmin)
@@ -0,0 +1,257 @@
+"""
+Read-only JSON API for the mobile app.
+
+    GET api/recipes/?fields=id,title,ingredients&order=price&limit=20&cursor=...
+    GET api/recipes/?ids=1,2,3          batch, in the requested order
+    GET api/recipes/<pk>/
+    GET api/ingredients/?q=mi&cursor=...
+    GET api/ingredients/<pk>/
+
+Lists are keyset paginated (see pagination.py), every response carries
+an ETag, and embedded ingredients of a whole page are loaded with one
+prefetch query, so a page or a batch always costs a fixed number of
+queries.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .cache import RECIPE_LIST, cache_view, recipe_versions
+from .conditional import conditional_page
+from .models import Ingredient, Recipe, RecipeIngredient
+from .pagination import KeysetPaginator
+from .views import INDEX_ORDERINGS
+
+# Поле ответа -> поля модели, которые для него нужно загрузить
+RECIPE_FIELDS = {
+    'id': ('id',),
+    'title': ('title',),
+    'description': ('description',),
+    'cooking_time': ('cooking_time',),
+    'image': ('image',),
+    'author': ('author__username',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    'total_price': ('total_price',),
+    'total_weight': ('total_weight',),
+    'total_weight_ready': ('total_weight_ready',),
+    'ingredients_count': ('ingredients_count',),
+    'ingredients': (),
+}
+INGREDIENT_FIELDS = ('id', 'name', 'weight', 'weight_ready', 'price', 'updated_at')
+EMBEDDED_INGREDIENT_FIELDS = ('id', 'name', 'weight', 'weight_ready', 'price')
+
+
+class ApiError(Exception):
+    status = 400
+
+
+class NotFound(ApiError):
+    status = 404
+
+
+def api_view(view):
+    """GET/HEAD only, ApiError becomes a JSON error response"""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def _json(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def _fields(request, available):
+    raw = request.GET.get('fields', '')
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(f'Unknown fields: {", ".join(unknown)}')
+    return fields or list(available)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit must be a number')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _ids(raw):
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in raw.split(',') if pk.strip()))
+    except ValueError:
+        raise ApiError('ids must be comma separated numbers')
+    if not ids or len(ids) > settings.API_BATCH_SIZE:
+        raise ApiError(f'Pass from 1 to {settings.API_BATCH_SIZE} ids')
+    return ids
+
+
+def _recipe_queryset(fields, ordering=()):
+    # id и updated_at нужны всегда: из них строится ETag
+    load = {'id', 'updated_at', *ordering}
+    load.update(name for field in fields for name in RECIPE_FIELDS[field])
+    queryset = Recipe.objects.only(*load)
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    return queryset
+
+
+def _recipe_data(recipe, fields):
+    data = {}
+    for field in fields:
+        if field == 'author':
+            data[field] = recipe.author.username if recipe.author_id else None
+        elif field == 'image':
+            data[field] = recipe.image.url if recipe.image else None
+        elif field == 'ingredients':
+            data[field] = [
+                _ingredient_data(link.ingredient, EMBEDDED_INGREDIENT_FIELDS)
+                for link in recipe.recipeingredient_set.all()
+            ]
+        else:
+            data[field] = getattr(recipe, field)
+    return data
+
+
+def _ingredient_data(ingredient, fields):
+    return {field: getattr(ingredient, field) for field in fields}
+
+
+def _serialize_recipes(recipes, fields):
+    if 'ingredients' in fields:
+        # Один запрос на всю страницу, а не по запросу на рецепт
+        links = RecipeIngredient.objects.select_related('ingredient').only(
+            'recipe', *(f'ingredient__{field}' for field in EMBEDDED_INGREDIENT_FIELDS)
+        ).order_by('ingredient__name', 'pk')
+        prefetch_related_objects(recipes, Prefetch('recipeingredient_set', queryset=links))
+    return [_recipe_data(recipe, fields) for recipe in recipes]
+
+
+def _etag_meta(request, objects, *extra):
+    """ETag parts from the query string, the objects' versions and extras"""
+    rows = [(obj.pk, obj.updated_at) for obj in objects]
+    last_modified = max((updated for _, updated in rows), default=None)
+    return (request.GET.urlencode(), rows, *extra), last_modified
+
+
+def _recipe_list(request):
+    """Keyset page or ?ids= batch of a request, fetched once per request"""
+    if hasattr(request, '_api_recipes'):
+        return request._api_recipes
+    fields = _fields(request, RECIPE_FIELDS)
+    if 'ids' in request.GET:
+        ids = _ids(request.GET['ids'])
+        found = {
+            recipe.pk: recipe
+            for recipe in _recipe_queryset(fields).filter(pk__in=ids)
+        }
+        recipes = [found[pk] for pk in ids if pk in found]
+        extra = {'missing': [pk for pk in ids if pk not in found]}
+    else:
+        ordering = INDEX_ORDERINGS.get(request.GET.get('order'), INDEX_ORDERINGS['title'])
+        paginator = KeysetPaginator(
+            _recipe_queryset(fields, ordering), ordering, _limit(request)
+        )
+        recipes = paginator.get_page(request.GET.get('cursor'))
+        extra = {'next': recipes.next_cursor, 'previous': recipes.previous_cursor}
+    request._api_recipes = fields, list(recipes), extra
+    return request._api_recipes
+
+
+def _recipe_list_meta(request):
+    _, recipes, extra = _recipe_list(request)
+    return _etag_meta(request, recipes, extra)
+
+
+@api_view
+@cache_view(lambda request: [RECIPE_LIST])
+@conditional_page(_recipe_list_meta)
+def recipes(request):
+    fields, recipes, extra = _recipe_list(request)
+    return _json({'results': _serialize_recipes(recipes, fields), **extra})
+
+
+def _recipe(request, pk):
+    if not hasattr(request, '_api_recipe'):
+        fields = _fields(request, RECIPE_FIELDS)
+        request._api_recipe = fields, _recipe_queryset(fields).filter(pk=pk).first()
+    return request._api_recipe
+
+
+def _recipe_meta(request, pk):
+    _, recipe = _recipe(request, pk)
+    if recipe is None:
+        return None
+    return _etag_meta(request, [recipe])
+
+
+@api_view
+@cache_view(lambda request, pk: recipe_versions(pk))
+@conditional_page(_recipe_meta)
+def recipe(request, pk):
+    fields, recipe = _recipe(request, pk)
+    if recipe is None:
+        raise NotFound('Recipe not found')
+    return _json(_serialize_recipes([recipe], fields)[0])
+
+
+def _ingredient_list(request):
+    if hasattr(request, '_api_ingredients'):
+        return request._api_ingredients
+    fields = _fields(request, INGREDIENT_FIELDS)
+    queryset = Ingredient.objects.only('id', 'name', 'updated_at', *fields)
+    query = request.GET.get('q', '').strip()
+    if query:
+        queryset = queryset.filter(name__istartswith=query)
+    paginator = KeysetPaginator(queryset, ('name', 'id'), _limit(request))
+    page = paginator.get_page(request.GET.get('cursor'))
+    extra = {'next': page.next_cursor, 'previous': page.previous_cursor}
+    request._api_ingredients = fields, list(page), extra
+    return request._api_ingredients
+
+
+def _ingredient_list_meta(request):
+    _, ingredients, extra = _ingredient_list(request)
+    return _etag_meta(request, ingredients, extra)
+
+
+@api_view
+@conditional_page(_ingredient_list_meta)
+def ingredients(request):
+    fields, ingredients, extra = _ingredient_list(request)
+    results = [_ingredient_data(ingredient, fields) for ingredient in ingredients]
+    return _json({'results': results, **extra})
+
+
+def _ingredient(request, pk):
+    if not hasattr(request, '_api_ingredient'):
+        fields = _fields(request, INGREDIENT_FIELDS)
+        ingredient = Ingredient.objects.only('id', 'updated_at', *fields).filter(pk=pk).first()
+        request._api_ingredient = fields, ingredient
+    return request._api_ingredient
+
+
+def _ingredient_meta(request, pk):
+    _, ingredient = _ingredient(request, pk)
+    if ingredient is None:
+        return None
+    return _etag_meta(request, [ingredient])
+
+
+@api_view
+@conditional_page(_ingredient_meta)
+def ingredient(request, pk):
+    fields, ingredient = _ingredient(request, pk)
+    if ingredient is None:
+        raise NotFound('Ingredient not found')
+    return _json(_ingredient_data(ingredient, fields))
@@ -0,0 +1,90 @@
+"""
+Async versions of the hot read-only pages, routed when ASYNC_VIEWS is on.
+
+Under an ASGI server a slow client or a slow query then waits on the
+event loop instead of holding a worker. Queries go through the async ORM;
+rendering stays sync (sync_to_async), so templates and context are the
+ones views.py uses.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from . import views
+from .cache import RECIPE_LIST, cache_view, recipe_versions
+from .conditional import conditional_page
+from .models import Ingredient, Recipe
+from .pagination import KeysetPaginator
+
+arender = sync_to_async(render)
+
+
+def _numbered_page(paginator, number):
+    page = paginator.get_page(number)
+    # Строки читаем здесь: из event loop ленивый queryset выполнить нельзя
+    page.object_list = list(page.object_list)
+    return page
+
+
+async def _index_page(request):
+    if hasattr(request, '_index_page'):
+        return request._index_page
+    order, ordering = views._index_order(request)
+    queryset = views._index_queryset()
+    if 'page' in request.GET:
+        paginator = Paginator(queryset.order_by(*ordering), settings.OBJS_ON_PAGE)
+        page = await sync_to_async(_numbered_page)(paginator, request.GET.get('page'))
+    else:
+        paginator = KeysetPaginator(queryset, ordering, settings.OBJS_ON_PAGE)
+        page = await paginator.aget_page(request.GET.get('cursor'))
+    request._index_page = page, order
+    return request._index_page
+
+
+async def _index_meta(request):
+    page, _ = await _index_page(request)
+    return views._page_meta(request, page)
+
+
+@cache_view(lambda request: [RECIPE_LIST])
+@conditional_page(_index_meta)
+async def index(request):
+    recipes, order = await _index_page(request)
+    context = {'recipes': recipes, 'order': order}
+    return await arender(request, 'recipe_catalog/index.html', context)
+
+
+async def _recipe_detail_meta(request, pk):
+    updated_at = await (
+        Recipe.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+    )
+    if updated_at is None:
+        return None
+    return (pk, updated_at), updated_at
+
+
+@cache_view(lambda request, pk: recipe_versions(pk))
+@conditional_page(_recipe_detail_meta)
+async def recipe_detail(request, pk):
+    try:
+        recipe = await Recipe.objects.aget(pk=pk)
+    except Recipe.DoesNotExist:
+        return await sync_to_async(views.handle_error_404)(request)
+    # Шаблон не должен ходить в БД из event loop
+    ingredients = [
+        ingredient async for ingredient in recipe.ingredients.order_by('name')
+    ]
+    context = views._recipe_context(recipe, ingredients)
+    return await arender(request, 'recipe_catalog/recipe.html', context)
+
+
+async def _ingredients_meta(request):
+    meta = await Ingredient.objects.aaggregate(**views.INGREDIENTS_VERSION)
+    return (meta['count'], meta['last']), meta['last']
+
+
+@conditional_page(_ingredients_meta)
+async def ingredients(request):
+    context = {'ingredients': [ingredient async for ingredient in Ingredient.objects.all()]}
+    return await arender(request, 'recipe_catalog/ingredients.html', context)
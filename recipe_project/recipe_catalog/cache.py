@@ -0,0 +1,162 @@
+"""
+Rendered-response cache for catalog pages.
+
+Every cached page depends on a few named version keys ('recipes' for the
+list, 'recipe:<pk>' and 'recipe:*' for one recipe). A version is part of
+the page's cache key, so signals invalidate a page by replacing the
+versions it depends on (see bump_versions) instead of deleting entries
+or flushing.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import routers
+
+RECIPE_LIST = 'recipes'
+# Общая версия всех страниц рецептов: сброс без ключа на каждый рецепт
+ALL_RECIPES = 'recipe:*'
+STATS_KEYS = {'hits': 'stats:hits', 'misses': 'stats:misses'}
+
+
+def get_cache():
+    return caches[settings.VIEW_CACHE_ALIAS]
+
+
+def recipe_key(pk):
+    return f'recipe:{pk}'
+
+
+def recipe_versions(pk):
+    """Version names a page of one recipe depends on"""
+    return [ALL_RECIPES, recipe_key(pk)]
+
+
+def get_versions(names):
+    """Return {name: version}, starting a new version for unknown names"""
+    cache = get_cache()
+    keys = {f'version:{name}': name for name in names}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # add() не перетирает версию, которую успел записать другой процесс
+        cache.add(key, time.time_ns(), timeout=None)
+        found[key] = cache.get(key)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def bump_versions(names):
+    """Invalidate every cached page that depends on any of the names"""
+    version = time.time_ns()
+    get_cache().set_many(
+        {f'version:{name}': version for name in names}, timeout=None
+    )
+
+
+def _count(stat):
+    cache = get_cache()
+    try:
+        cache.incr(STATS_KEYS[stat])
+    except ValueError:
+        if not cache.add(STATS_KEYS[stat], 1, timeout=None):
+            cache.incr(STATS_KEYS[stat])
+
+
+def cache_stats():
+    values = get_cache().get_many(STATS_KEYS.values())
+    stats = {stat: values.get(key, 0) for stat, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    get_cache().delete_many(STATS_KEYS.values())
+
+
+def _cache_key(request, view_name, versions):
+    auth = 'auth' if request.user.is_authenticated else 'anon'
+    parts = [request.get_full_path(), auth] + [
+        f'{name}={version}' for name, version in sorted(versions.items())
+    ]
+    digest = hashlib.md5('\n'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'view:{view_name}:{digest}'
+
+
+def _cached_response(request, view_name, names):
+    """Return (key, response) where response is None on a miss"""
+    versions = get_versions(names)
+    key = _cache_key(request, view_name, versions)
+    response = get_cache().get(key)
+    if response is None:
+        _count('misses')
+        return key, None
+    _count('hits')
+    response['X-Cache'] = 'HIT'
+    # Запись хранит ETag/Last-Modified: 304 можно ответить без БД
+    return key, get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response,
+    )
+
+
+def _cacheable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # Страница с csrf_token без своей cookie сломала бы формы
+    return not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+
+
+def _store_response(request, key, response):
+    if _cacheable(request, response):
+        timeout = settings.VIEW_CACHE_TIMEOUT
+        if routers.replica_used():
+            # Реплика могла отстать от уже поднятой версии: не дольше её лага
+            timeout = min(timeout, settings.REPLICA_MAX_LAG)
+        get_cache().set(key, response, timeout)
+    response['X-Cache'] = 'MISS'
+
+
+def cache_view(dependencies):
+    """
+    Cache successful GET/HEAD responses of a view (sync or async).
+
+    `dependencies(request, *args, **kwargs)` returns the version names the
+    page is built from; the key also covers path, query string and
+    whether the user is logged in.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                key, response = await sync_to_async(_cached_response)(
+                    request, view.__name__, dependencies(request, *args, **kwargs)
+                )
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    await sync_to_async(_store_response)(request, key, response)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key, response = _cached_response(
+                request, view.__name__, dependencies(request, *args, **kwargs)
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                _store_response(request, key, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,76 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag from the data a page is rendered from"""
+    source = repr((settings.RELEASE,) + parts).encode()
+    return quote_etag(hashlib.sha1(source, usedforsecurity=False).hexdigest())
+
+
+def _check(request, meta):
+    """Return (etag, timestamp, 304 response or None) for page metadata"""
+    parts, last_modified = meta
+    etag = make_etag(request.path, *parts)
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return etag, timestamp, response
+
+
+def _set_validators(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if timestamp is not None:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+    return response
+
+
+def _async_conditional(view, metadata):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await view(request, *args, **kwargs)
+        meta = await metadata(request, *args, **kwargs)
+        if meta is None:
+            return await view(request, *args, **kwargs)
+        etag, timestamp, response = _check(request, meta)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        return _set_validators(response, etag, timestamp)
+    return wrapper
+
+
+def conditional_page(metadata):
+    """
+    ETag / Last-Modified / 304 for a GET view.
+
+    `metadata(request, *args, **kwargs)` runs one cheap query and returns
+    (etag_parts, last_modified) or None when the view should answer by
+    itself (e.g. 404). A matching If-None-Match / If-Modified-Since is
+    answered with 304 without calling the view.
+    Django's @condition would need two separate lookups for the same data.
+    An async view takes an async `metadata`.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _async_conditional(view, metadata)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            meta = metadata(request, *args, **kwargs)
+            if meta is None:
+                return view(request, *args, **kwargs)
+            etag, timestamp, response = _check(request, meta)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _set_validators(response, etag, timestamp)
+        return wrapper
+    return decorator
@@ -0,0 +1,110 @@
+"""
+Streaming export of the catalog as CSV or NDJSON.
+
+Rows come from QuerySet.iterator(chunk_size): a server-side cursor where
+the backend has one, with RecipeIngredient prefetched once per chunk, so
+memory does not grow with the catalog and the query count is
+O(rows / chunk_size). Column names match manage.py import_catalog, so an
+export can be loaded back.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+from django.utils.duration import duration_string
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+INGREDIENT_COLUMNS = ('id', 'name', 'weight', 'weight_ready', 'price')
+RECIPE_COLUMNS = (
+    'id', 'title', 'description', 'cooking_time', 'author', 'created_at',
+    'updated_at', 'total_price', 'total_weight', 'total_weight_ready', 'ingredients',
+)
+# Строки склеиваются в куски примерно такого размера перед отдачей
+BUFFER_SIZE = 64 * 1024
+
+
+def ingredient_rows(chunk_size):
+    queryset = Ingredient.objects.order_by('pk').values_list(*INGREDIENT_COLUMNS)
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(INGREDIENT_COLUMNS, values))
+
+
+def recipe_rows(chunk_size):
+    links = RecipeIngredient.objects.select_related('ingredient').only(
+        'recipe', 'ingredient__name'
+    ).order_by('pk')
+    queryset = (
+        Recipe.objects.order_by('pk')
+        .select_related('author')
+        .only(*RECIPE_COLUMNS[:-1], 'author__username')
+        .prefetch_related(Prefetch('recipeingredient_set', queryset=links))
+    )
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': recipe.pk,
+            'title': recipe.title,
+            'description': recipe.description,
+            'cooking_time': duration_string(recipe.cooking_time),
+            'author': recipe.author.username if recipe.author else None,
+            'created_at': recipe.created_at.isoformat(),
+            'updated_at': recipe.updated_at.isoformat(),
+            'total_price': recipe.total_price,
+            'total_weight': recipe.total_weight,
+            'total_weight_ready': recipe.total_weight_ready,
+            'ingredients': [
+                link.ingredient.name for link in recipe.recipeingredient_set.all()
+            ],
+        }
+
+
+KINDS = {
+    'ingredients': (ingredient_rows, INGREDIENT_COLUMNS),
+    'recipes': (recipe_rows, RECIPE_COLUMNS),
+}
+
+
+class _Line:
+    """File-like object for csv.writer that hands back what was written"""
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns)
+    for row in rows:
+        if isinstance(row.get('ingredients'), list):
+            row['ingredients'] = ';'.join(row['ingredients'])
+        yield writer.writerow([
+            '' if row[column] is None else row[column] for column in columns
+        ])
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+
+
+def export_lines(kind, export_format, chunk_size=2000):
+    """Yield the catalog part `kind` in `export_format` as text pieces"""
+    rows_for, columns = KINDS[kind]
+    rows = rows_for(chunk_size)
+    if export_format == 'csv':
+        lines = _csv_lines(rows, columns)
+    else:
+        lines = _ndjson_lines(rows)
+
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
@@ -1,6 +1,13 @@
+import hashlib
+from decimal import Decimal
+
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 
 from recipe_catalog.models import Ingredient, Recipe
+from recipe_catalog.widgets import AutocompleteSelectMultiple
 
 class UserForm(forms.Form):
     first_name = forms.CharField(label='First name', max_length=100)
@@ -24,6 +31,98 @@ class IngredientForm(forms.ModelForm):
         }
         model = Ingredient
 
+class IngredientBulkForm(IngredientForm):
+    """
+    Row of the bulk edit page. `version` is a digest of the row as it was
+    loaded: a posted row that differs from it was edited by the user, a
+    stored row that differs from it was changed by someone else since.
+    """
+    version = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.edited = False
+        # До clean(): потом _post_clean перезапишет instance введёнными значениями
+        self.stored_version = self.digest(
+            getattr(self.instance, name) for name in self._meta.fields
+        )
+        self.fields['version'].initial = self.stored_version
+
+    @staticmethod
+    def digest(values):
+        # 5 и 5.00 — одна цена
+        source = repr([
+            value.normalize() if isinstance(value, Decimal) else value for value in values
+        ])
+        return hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.instance.pk or any(name not in cleaned_data for name in self._meta.fields):
+            return cleaned_data
+        loaded = cleaned_data.get('version')
+        self.edited = self.digest(cleaned_data[name] for name in self._meta.fields) != loaded
+        # Конфликт только для изменённых строк: чужую правку не затираем
+        if self.edited and self.stored_version != loaded:
+            raise ValidationError(
+                'Changed by someone else after this page was loaded, '
+                'reload it to see the current values',
+                code='conflict',
+            )
+        return cleaned_data
+
+
+class LoadedChoiceField(forms.ModelChoiceField):
+    """Formset pk field resolved from rows the formset already loaded"""
+
+    def __init__(self, objects, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, ValueError, TypeError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice'
+            )
+
+
+class BaseIngredientBulkFormSet(forms.BaseModelFormSet):
+    """queryset may be a list of already loaded rows (a page of the editor)"""
+
+    def get_queryset(self):
+        if isinstance(self.queryset, list):
+            return self.queryset
+        return super().get_queryset()
+
+    @cached_property
+    def loaded_objects(self):
+        return {obj.pk: obj for obj in self.get_queryset()}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # ModelChoiceField по умолчанию делает SELECT на каждую строку
+        field = form.fields['id']
+        form.fields['id'] = LoadedChoiceField(
+            self.loaded_objects, field.queryset,
+            initial=field.initial, required=False, widget=field.widget,
+        )
+
+
+IngredientBulkFormSet = forms.modelformset_factory(
+    Ingredient,
+    form=IngredientBulkForm,
+    formset=BaseIngredientBulkFormSet,
+    extra=0,
+    max_num=settings.INGREDIENTS_BULK_PAGE_SIZE,
+    absolute_max=settings.INGREDIENTS_BULK_PAGE_SIZE,
+    validate_max=True,
+)
+
+
 class RecipeForm(forms.ModelForm):
     class Meta:
         model = Recipe
@@ -46,5 +145,36 @@ class RecipeForm(forms.ModelForm):
         widgets = {
             'image': forms.FileInput(attrs={'accept': 'image/*'}),
             'description': forms.Textarea(attrs={'rows': 4}),
-            'ingredients': forms.SelectMultiple(attrs={'class': 'select2'}),
+            'ingredients': AutocompleteSelectMultiple(
+                'recipe_catalog:ingredient_autocomplete'
+            ),
         }
+
+class PantryForm(forms.Form):
+    ingredients = forms.ModelMultipleChoiceField(
+        label='I have',
+        queryset=Ingredient.objects.only('id', 'name'),
+        widget=AutocompleteSelectMultiple('recipe_catalog:ingredient_autocomplete'),
+    )
+    missing = forms.IntegerField(
+        label='Missing at most',
+        min_value=0,
+        max_value=settings.PANTRY_MAX_MISSING,
+        initial=0,
+        required=False,
+        help_text='How many ingredients you are ready to buy',
+    )
+
+
+class RepriceForm(forms.Form):
+    percent = forms.DecimalField(
+        label='Change prices by, %',
+        min_value=Decimal('-99.99'),
+        max_digits=6,
+        decimal_places=2,
+        help_text='7 raises prices by 7%, -2.5 lowers them by 2.5%',
+    )
+    source = forms.CharField(
+        label='Note', max_length=255, required=False,
+        help_text='Stored with every price history row',
+    )
@@ -0,0 +1,94 @@
+"""
+Resized variants of uploaded recipe images.
+
+For an original 'recipe_images/cat.jpg' the variants are stored next to
+it as 'recipe_images/cat.<width>w.webp' / '.jpg', plus a tiny blurred
+'cat.placeholder.jpg' shown while the real image loads. Names depend only
+on the original name, so templates build srcset without touching the DB.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+PLACEHOLDER_WIDTH = 24
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{extension}'
+
+
+def placeholder_name(name):
+    root, _ = os.path.splitext(name)
+    return f'{root}.placeholder.jpg'
+
+
+def variant_names(name):
+    names = [
+        variant_name(name, width, extension)
+        for width in settings.IMAGE_VARIANT_WIDTHS
+        for extension, _, _ in FORMATS
+    ]
+    return names + [placeholder_name(name)]
+
+
+def has_variants(name, storage=default_storage):
+    # Заглушка пишется последней: если она есть, есть и все варианты
+    return storage.exists(placeholder_name(name))
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _write(storage, name, data):
+    if hasattr(storage, 'save_exact'):
+        # ContentAddressedStorage переименовал бы вариант по хешу
+        storage.save_exact(name, ContentFile(data))
+        return
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def generate_variants(name, storage=default_storage):
+    """Write every width/format variant and the placeholder of an image"""
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        # Не увеличиваем: маленький оригинал просто пережимается
+        resized = image.copy()
+        resized.thumbnail((min(width, image.width), image.height), Image.LANCZOS)
+        for extension, image_format, _ in FORMATS:
+            data = _encode(resized, image_format, quality=80, optimize=True)
+            _write(storage, variant_name(name, width, extension), data)
+
+    placeholder = image.copy()
+    placeholder.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    placeholder = placeholder.filter(ImageFilter.GaussianBlur(1))
+    _write(storage, placeholder_name(name), _encode(placeholder, 'JPEG', quality=40))
+
+
+def delete_variants(name, storage=default_storage):
+    for variant in variant_names(name):
+        storage.delete(variant)
+
+
+def placeholder_data_uri(name, storage=default_storage):
+    with storage.open(placeholder_name(name), 'rb') as placeholder:
+        data = base64.b64encode(placeholder.read()).decode()
+    return f'data:image/jpeg;base64,{data}'
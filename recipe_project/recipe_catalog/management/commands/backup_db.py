@@ -0,0 +1,56 @@
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from recipe_catalog import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Online backup of the SQLite database through the backup API: '
+        'the site keeps serving and writing while it runs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target',
+            help='Backup file, or a directory for a timestamped backup-*.sqlite3',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help='Pages copied per step, the read lock is released between steps',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5, help='Pause between steps, ms',
+        )
+        parser.add_argument(
+            '--keep', type=int, default=0,
+            help='With a directory target: how many newest backups to keep (0 = all)',
+        )
+
+    def handle(self, *args, target, database, pages, sleep, keep, **options):
+        connection = connections[database]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'{database} is not a SQLite database')
+        if connection.is_in_memory_db():
+            raise CommandError('An in-memory database has nothing to back up')
+        directory = Path(target) if Path(target).is_dir() else None
+        if directory is not None:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            target = directory / f'backup-{stamp}.sqlite3'
+
+        def progress(remaining, total):
+            done = total - remaining
+            self.stdout.write(f'{done}/{total} pages', ending='\r')
+
+        seconds = sqlite.backup(
+            connection, target, pages=pages, sleep=sleep / 1000, progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f'{target} written in {seconds:.1f}s'))
+        if directory is not None and keep > 0:
+            for old in sorted(directory.glob('backup-*.sqlite3'), reverse=True)[keep:]:
+                old.unlink()
+                self.stdout.write(f'{old} removed')
@@ -0,0 +1,254 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment
+)
+from django.urls import URLResolver, reverse
+from django.utils.http import urlencode
+
+from recipe_catalog import urls as catalog_urls
+from recipe_catalog.models import Ingredient, Recipe
+
+User = get_user_model()
+
+# Значения параметров маршрутов, кроме pk (он берётся из базы)
+ROUTE_ARGUMENTS = {'kind': 'recipes', 'export_format': 'csv'}
+# Варианты запросов: имя маршрута -> [(метка, GET-параметры)],
+# вариант с пустой меткой заменяет запрос без параметров
+ROUTE_QUERIES = {
+    'index': [('order=price', {'order': 'price'})],
+    'search': [('', {'q': 'soup'})],
+    'ingredient_autocomplete': [('', {'q': 'sa'}), ('substring', {'q': 'alt'})],
+    'api_recipes': [('ids', {'ids': '1,2,3,4,5,6,7,8,9,10'})],
+    'pantry': [('', {'ingredients': ['1', '2', '3', '4', '5', '6', '7', '8'], 'missing': 1})],
+}
+# Метрики, по которым сравнивается базовый прогон; рост > порога = регрессия
+COMPARED = ('p50_ms', 'p99_ms', 'queries', 'bytes', 'peak_kib')
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def _content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every recipe_catalog route and admin changelist against a '
+        'fresh seeded database: latency percentiles, queries, bytes, peak memory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=300)
+        parser.add_argument(
+            '--links', type=float, default=8, help='Mean ingredients per recipe',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=30, help='Timed requests per route',
+        )
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--route', action='append', help='Only these routes')
+        parser.add_argument(
+            '--view-cache', action='store_true',
+            help='Keep the rendered page cache on (off by default: measure views)',
+        )
+        parser.add_argument('--output', help='Write results JSON to this file')
+        parser.add_argument('--baseline', help='Results JSON to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Allowed growth of a metric over the baseline, percent',
+        )
+        parser.add_argument(
+            '--min-ms', type=float, default=1.0,
+            help='Latency changes smaller than this are noise, not regressions',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        # Без сэмплирования QueryStatsMiddleware: меряем сами страницы
+        overrides = {'DEBUG': False, 'SQL_STATS_SAMPLE_RATE': 0}
+        if not options['view_cache']:
+            overrides['CACHES'] = {
+                **settings.CACHES,
+                settings.VIEW_CACHE_ALIAS: {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+                },
+            }
+        try:
+            with override_settings(**overrides):
+                self.stderr.write('Seeding...')
+                self.seed(options['recipes'], options['ingredients'], options['links'])
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(
+                results, options['baseline'], options['threshold'], options['min_ms']
+            )
+
+    def seed(self, recipes, ingredients, links):
+        user = User.objects.create_superuser('bench', password='bench')
+        call_command(
+            'seed_catalog', recipes=recipes, ingredients=ingredients, links=links,
+            authors=max(1, recipes // 100), seed=0, stdout=StringIO(),
+        )
+        # Маршруты с pk берут первый рецепт: он должен быть рецептом bench,
+        # иначе recipe_edit отвечает отказом вместо формы
+        first = Recipe.objects.order_by('pk').values('pk')[:1]
+        Recipe.objects.filter(pk__in=first).update(author=user)
+
+    def routes(self):
+        """[(label, url)] for catalog routes and admin changelists"""
+        samples = {
+            'recipe': Recipe.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'ingredient': Ingredient.objects.order_by('pk').values_list('pk', flat=True).first(),
+        }
+        routes = []
+        for pattern in catalog_urls.urlpatterns:
+            if isinstance(pattern, URLResolver):
+                continue
+            kwargs = {}
+            for argument in pattern.pattern.regex.groupindex:
+                if argument == 'pk':
+                    kwargs['pk'] = samples['ingredient' if 'ingredient' in pattern.name
+                                           else 'recipe']
+                elif argument in ROUTE_ARGUMENTS:
+                    kwargs[argument] = ROUTE_ARGUMENTS[argument]
+                else:
+                    kwargs = None
+                    break
+            if kwargs is None:
+                self.stderr.write(f'{pattern.name}: skipped, no sample for its arguments')
+                continue
+            url = reverse(f'{catalog_urls.app_name}:{pattern.name}', kwargs=kwargs)
+            queries = ROUTE_QUERIES.get(pattern.name, [])
+            if all(label for label, _ in queries):
+                queries = [('', {})] + queries
+            for label, query in queries:
+                name = f'{pattern.name}?{label}' if label else pattern.name
+                routes.append((
+                    name, f'{url}?{urlencode(query, doseq=True)}' if query else url
+                ))
+        for model in admin.site._registry:
+            opts = model._meta
+            routes.append((
+                f'admin:{opts.app_label}_{opts.model_name}_changelist',
+                reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'),
+            ))
+        return routes
+
+    def run(self, options):
+        client = Client()
+        client.force_login(User.objects.get(username='bench'))
+        routes = self.routes()
+        if options['route']:
+            routes = [route for route in routes if route[0] in options['route']]
+        results = {}
+        for label, url in routes:
+            results[label] = self.measure(client, url, options['warmup'], options['requests'])
+            self.stderr.write(
+                '{:45} {status} p50 {p50_ms:8.2f} ms  p99 {p99_ms:8.2f} ms  '
+                '{queries:4} q  {bytes:8} B  {peak_kib:8.1f} KiB'.format(label, **results[label])
+            )
+        return {
+            'meta': {
+                'recipes': options['recipes'],
+                'ingredients': options['ingredients'],
+                'links': options['links'],
+                'requests': options['requests'],
+                'view_cache': options['view_cache'],
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'routes': results,
+        }
+
+    def measure(self, client, url, warmup, requests):
+        for _ in range(warmup):
+            _content(client.get(url))
+        latencies = []
+        for _ in range(max(requests, 1)):
+            # Журнал запросов ограничен 9000 записями: полный не даст посчитать
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                body = _content(response)
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_count = len(queries)
+        # tracemalloc замедляет всё, поэтому память меряем отдельным запросом
+        tracemalloc.start()
+        try:
+            _content(client.get(url))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(_percentile(latencies, 50), 3),
+            'p90_ms': round(_percentile(latencies, 90), 3),
+            'p99_ms': round(_percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries': query_count,
+            'bytes': len(body),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def compare(self, results, baseline_path, threshold, min_ms):
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)['routes']
+        regressions = []
+        for label, current in results['routes'].items():
+            before = baseline.get(label)
+            if before is None:
+                continue
+            for metric in COMPARED:
+                old, new = before[metric], current[metric]
+                limit = old * (1 + threshold / 100)
+                if metric == 'queries':
+                    # Лишний запрос всегда регрессия
+                    regressed = new > old
+                elif metric.endswith('_ms'):
+                    regressed = new > limit and new - old > min_ms
+                else:
+                    regressed = new > limit
+                if regressed:
+                    change = f'+{(new - old) / old * 100:.0f}%' if old else 'new'
+                    regressions.append(f'{label}: {metric} {old} -> {new} ({change})')
+        for line in regressions:
+            self.stderr.write(self.style.ERROR(line))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions over {baseline_path}')
+        self.stderr.write(self.style.SUCCESS(f'No regressions over {baseline_path}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipe_catalog.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Show hit/miss counters of the catalog page cache '
+        '(with locmem use the cache-stats/ page, counters live in the web process)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters')
+
+    def handle(self, *args, reset, **options):
+        stats = cache_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  "
+            f"hit ratio: {stats['hit_ratio']:.1%}"
+        )
+        if reset:
+            reset_cache_stats()
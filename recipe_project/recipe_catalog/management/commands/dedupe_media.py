@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipe_catalog import images
+from recipe_catalog.models import Recipe
+from recipe_catalog.signals import invalidate_pages, release_image
+from recipe_catalog.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        'Move existing recipe images to content-addressed names, '
+        'merging identical files and deleting the duplicates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report what would change',
+        )
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Also delete old-style files in the upload directory no recipe uses',
+        )
+
+    def handle(self, *args, dry_run, delete_orphans, **options):
+        storage = Recipe._meta.get_field('image').storage
+        names = (
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        moved = freed = 0
+        for name in list(names):
+            if is_content_addressed(name):
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f'{name}: file is missing, skipped')
+                continue
+            size = storage.size(name)
+            with storage.open(name, 'rb') as content:
+                new_name = storage.content_name(name, content)
+                existed = storage.exists(new_name)
+                self.stdout.write(f'{name} -> {new_name}{" (duplicate)" if existed else ""}')
+                if dry_run:
+                    continue
+                storage.save(name, content)
+            freed += size if existed else 0
+            moved += 1
+            with transaction.atomic():
+                recipes = Recipe.objects.filter(image=name)
+                invalidate_pages(list(recipes.values_list('pk', flat=True)))
+                recipes.update(image=new_name, updated_at=timezone.now())
+            release_image(name, storage)
+            if not images.has_variants(new_name, storage):
+                images.generate_variants(new_name, storage)
+        if delete_orphans:
+            freed += self.delete_orphans(storage, dry_run)
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} files moved, {freed} bytes freed'
+        ))
+
+    def delete_orphans(self, storage, dry_run):
+        directory = Recipe._meta.get_field('image').upload_to.rstrip('/')
+        if not storage.exists(directory):
+            return 0
+        freed = 0
+        for filename in storage.listdir(directory)[1]:
+            name = f'{directory}/{filename}'
+            if is_content_addressed(name) or Recipe.objects.filter(image=name).exists():
+                continue
+            freed += storage.size(name)
+            self.stdout.write(f'{name}: orphan')
+            if not dry_run:
+                storage.delete(name)
+        return freed
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipe_catalog.export import FORMATS, KINDS, export_lines
+
+
+class Command(BaseCommand):
+    help = 'Stream ingredients or recipes (with ingredient names) as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write, stdout by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows fetched (and prefetched) per query',
+        )
+
+    def handle(self, *args, kind, format, output, chunk_size, **options):
+        pieces = export_lines(kind, format, chunk_size)
+        if not output:
+            for piece in pieces:
+                self.stdout.write(piece, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            for piece in pieces:
+                file.write(piece)
+        self.stderr.write(self.style.SUCCESS(f'{kind} written to {output}'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipe_catalog import signals
+from recipe_catalog.images import generate_variants, has_variants
+from recipe_catalog.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for existing recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true', help='Regenerate existing variants too',
+        )
+
+    def handle(self, *args, force, **options):
+        storage = Recipe._meta.get_field('image').storage
+        names = (
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        done = skipped = failed = 0
+        for name in names.iterator():
+            if not force and has_variants(name, storage):
+                skipped += 1
+                continue
+            try:
+                generate_variants(name, storage)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f'{name}: {exc}')
+                continue
+            self.refresh_pages(name)
+            done += 1
+            self.stdout.write(f'{name}: ok')
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} generated, {skipped} already present, {failed} failed'
+        ))
+
+    def refresh_pages(self, name):
+        """New ETags and cached pages for the recipes showing the image"""
+        recipes = Recipe.objects.filter(image=name)
+        ids = list(recipes.values_list('pk', flat=True))
+        # ETag страницы строится из updated_at: без него клиенты получат 304
+        recipes.update(updated_at=timezone.now())
+        signals.invalidate_pages(ids)
@@ -0,0 +1,293 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipe_catalog.models import ImportCheckpoint, Ingredient, Recipe, RecipeIngredient
+from recipe_catalog.signals import ingredients_changed, recipes_changed
+
+User = get_user_model()
+
+# Ограничение на число параметров в одном IN (...) у SQLite
+LOOKUP_BATCH = 500
+
+
+class Source:
+    """
+    CSV or JSONL rows of a file, read line by line from a byte offset.
+
+    `offset` always points right after the last row handed out, so it can
+    be stored as a checkpoint and passed back to continue from there.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.is_csv = os.path.splitext(path)[1].lower() == '.csv'
+        self.file = open(path, 'rb')
+        self.fieldnames = None
+        if self.is_csv:
+            header = self.file.readline().decode('utf-8-sig')
+            self.fieldnames = [name.strip() for name in next(csv.reader([header]))]
+            offset = max(offset, self.file.tell())
+        self.file.seek(offset)
+        self.offset = offset
+
+    def close(self):
+        self.file.close()
+
+    def lines(self):
+        for line in self.file:
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+    def __iter__(self):
+        if self.is_csv:
+            # DictReader дочитывает строки только по мере надобности,
+            # поэтому offset после каждой записи точный
+            yield from csv.DictReader(self.lines(), fieldnames=self.fieldnames)
+            return
+        for line in self.lines():
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield ValidationError(f'invalid JSON: {error}')
+
+
+def _lookup(queryset, field, values):
+    """{value: first object} for values of a (not unique) field"""
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), LOOKUP_BATCH):
+        batch = queryset.filter(**{f'{field}__in': values[start:start + LOOKUP_BATCH]})
+        for obj in batch.order_by('pk'):
+            found.setdefault(getattr(obj, field), obj)
+    return found
+
+
+def _clean(model, row, name, default=None):
+    value = row.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value in (None, ''):
+        if default is not None:
+            return default
+    return model._meta.get_field(name).clean(value, None)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import ingredients and recipes from CSV or JSONL files in batched, '
+        'restartable transaction chunks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            help='Ingredients file: name, weight, weight_ready, price (upserted by name)',
+        )
+        parser.add_argument(
+            '--recipes',
+            help=(
+                'Recipes file: title, description, cooking_time, author, ingredients '
+                '(a list in JSONL, names separated by ";" in CSV)'
+            ),
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows per transaction',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore saved checkpoints and read the files from the beginning',
+        )
+
+    def handle(self, *args, ingredients, recipes, chunk_size, restart, **options):
+        if not ingredients and not recipes:
+            raise CommandError('Nothing to import: pass --ingredients and/or --recipes')
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        self.chunk_size = chunk_size
+        # Ингредиенты первыми: рецепты ссылаются на них по имени
+        if ingredients:
+            self.import_file(ingredients, 'ingredients', self.write_ingredients, restart)
+        if recipes:
+            self.import_file(recipes, 'recipes', self.write_recipes, restart)
+
+    def import_file(self, path, kind, write, restart):
+        if not os.path.isfile(path):
+            raise CommandError(f'{path}: no such file')
+        key = f'{kind}:{os.path.abspath(path)}'
+        checkpoint = ImportCheckpoint.objects.filter(source=key).first()
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(source=key)
+        if restart:
+            checkpoint.offset = checkpoint.rows = 0
+        elif checkpoint.offset > os.path.getsize(path):
+            raise CommandError(
+                f'{path} is shorter than at the last import, use --restart'
+            )
+        elif checkpoint.rows:
+            self.stdout.write(f'{path}: resuming after row {checkpoint.rows}')
+
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0}
+        source = Source(path, checkpoint.offset)
+        started = time.monotonic()
+        first_row = checkpoint.rows + 1
+        done = 0
+        try:
+            chunk = []
+            for row in source:
+                chunk.append((first_row + done + len(chunk), row))
+                if len(chunk) < self.chunk_size:
+                    continue
+                done += self.commit_chunk(chunk, write, checkpoint, source.offset)
+                chunk = []
+                self.report(kind, done, started, ending='\r')
+            if chunk:
+                done += self.commit_chunk(chunk, write, checkpoint, source.offset)
+        finally:
+            source.close()
+        self.report(kind, done, started)
+        self.stdout.write(self.style.SUCCESS(
+            '{}: {created} created, {updated} updated, {skipped} skipped'.format(
+                kind, **self.stats
+            )
+        ))
+
+    def commit_chunk(self, chunk, write, checkpoint, offset):
+        with transaction.atomic():
+            write(self.valid_rows(chunk))
+            # Чекпоинт в той же транзакции: пачка либо целиком учтена, либо нет
+            checkpoint.offset = offset
+            checkpoint.rows += len(chunk)
+            checkpoint.save()
+        return len(chunk)
+
+    def valid_rows(self, chunk):
+        for number, row in chunk:
+            if isinstance(row, dict):
+                yield number, row
+            elif isinstance(row, ValidationError):
+                self.skip(number, row)
+            else:
+                self.skip(number, 'expected an object')
+
+    def skip(self, number, error):
+        messages = error.messages if isinstance(error, ValidationError) else [str(error)]
+        self.stderr.write(f'row {number}: {"; ".join(messages)}')
+        self.stats['skipped'] += 1
+
+    def report(self, kind, done, started, ending='\n'):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(f'{kind}: {done} rows, {rate:.0f} rows/s', ending=ending)
+
+    def write_ingredients(self, rows):
+        values = {}
+        for number, row in rows:
+            try:
+                name = _clean(Ingredient, row, 'name')
+                values[name] = {
+                    field: _clean(Ingredient, row, field)
+                    for field in ('weight', 'weight_ready', 'price')
+                }
+            except ValidationError as error:
+                self.skip(number, error)
+        if not values:
+            return
+
+        existing = _lookup(Ingredient.objects.all(), 'name', values)
+        now = timezone.now()
+        changed, created = [], []
+        for name, fields in values.items():
+            ingredient = existing.get(name)
+            if ingredient is None:
+                created.append(Ingredient(name=name, **fields))
+                continue
+            if all(getattr(ingredient, field) == value for field, value in fields.items()):
+                continue
+            for field, value in fields.items():
+                setattr(ingredient, field, value)
+            # bulk_update не трогает auto_now
+            ingredient.updated_at = now
+            changed.append(ingredient)
+
+        Ingredient.objects.bulk_create(created)
+        if changed:
+            Ingredient.objects.bulk_update(
+                changed, ['weight', 'weight_ready', 'price', 'updated_at']
+            )
+            # bulk-операции не шлют сигналы: итоги, поиск и кеш обновляем сами
+            ingredients_changed([ingredient.pk for ingredient in changed])
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(changed)
+
+    def parse_recipe(self, row):
+        """(unsaved recipe, author name, ingredient names) of a valid row"""
+        names = row.get('ingredients') or []
+        if isinstance(names, str):
+            names = names.split(';')
+        if not isinstance(names, list):
+            raise ValidationError('ingredients must be a list of names')
+        recipe = Recipe(
+            title=_clean(Recipe, row, 'title'),
+            description=_clean(Recipe, row, 'description'),
+            cooking_time=_clean(
+                Recipe, row, 'cooking_time',
+                default=Recipe._meta.get_field('cooking_time').get_default(),
+            ),
+        )
+        names = {str(name).strip() for name in names} - {''}
+        return recipe, (row.get('author') or '').strip(), names
+
+    def write_recipes(self, rows):
+        parsed = []
+        for number, row in rows:
+            try:
+                parsed.append((number, *self.parse_recipe(row)))
+            except ValidationError as error:
+                self.skip(number, error)
+        if not parsed:
+            return
+
+        ingredients = _lookup(
+            Ingredient.objects.only('pk', 'name'), 'name',
+            set().union(*(names for _, _, _, names in parsed)),
+        )
+        authors = _lookup(
+            User.objects.only('pk', 'username'), 'username',
+            {author for _, _, author, _ in parsed if author},
+        )
+        recipes, links = [], []
+        for number, recipe, author, names in parsed:
+            missing = sorted(names - ingredients.keys())
+            if missing:
+                self.skip(number, f'unknown ingredients: {", ".join(missing)}')
+                continue
+            if author and author not in authors:
+                self.skip(number, f'unknown author: {author}')
+                continue
+            recipe.author = authors.get(author)
+            recipes.append(recipe)
+            links.append([ingredients[name] for name in names])
+        if not recipes:
+            return
+
+        Recipe.objects.bulk_create(recipes)
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient)
+            for recipe, recipe_ingredients in zip(recipes, links)
+            for ingredient in recipe_ingredients
+        ])
+        # Диапазон вместо списка id; чужие рецепты в нём просто пересчитаются
+        ids = [recipe.pk for recipe in recipes]
+        recipes_changed(Recipe.objects.filter(pk__range=(min(ids), max(ids))))
+        self.stats['created'] += len(recipes)
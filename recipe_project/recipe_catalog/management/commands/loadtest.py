@@ -0,0 +1,127 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response, return (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(host, port, paths, offset, deadline, latencies, errors):
+    """One keep-alive connection sending requests back to back"""
+    reader = writer = None
+    number = offset
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errors.append('connection')
+            keep_alive = False
+            # Не крутимся вхолостую, если сервер не принимает соединения
+            await asyncio.sleep(0.01)
+        else:
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a running server with many concurrent keep-alive connections '
+        'and report throughput and latency percentiles (compare WSGI vs ASGI)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Server root, e.g. http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, can be repeated (default: /)',
+        )
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds')
+        parser.add_argument(
+            '--json', action='store_true', dest='as_json', help='Print results as JSON',
+        )
+
+    def handle(self, *args, url, paths, concurrency, duration, as_json, **options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError('Only plain http://host[:port] URLs are supported')
+        result = asyncio.run(self.run(
+            parts.hostname, parts.port or 80, paths or ['/'], concurrency, duration
+        ))
+        if as_json:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(
+            '{requests} requests, {errors} errors in {seconds:.1f}s: {rps:.1f} req/s\n'
+            'latency ms: p50 {p50:.1f}, p90 {p90:.1f}, p99 {p99:.1f}, max {max:.1f}'
+            .format(**result)
+        )
+
+    async def run(self, host, port, paths, concurrency, duration):
+        latencies, errors = [], []
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _client(host, port, paths, number, deadline, latencies, errors)
+            for number in range(concurrency)
+        ))
+        seconds = time.monotonic() - started
+        if len(latencies) < 2:
+            raise CommandError(f'Only {len(latencies)} responses, is the server up?')
+        milliseconds = [latency * 1000 for latency in latencies]
+        return {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'seconds': seconds,
+            'rps': len(latencies) / seconds,
+            'p50': _percentile(milliseconds, 50),
+            'p90': _percentile(milliseconds, 90),
+            'p99': _percentile(milliseconds, 99),
+            'max': max(milliseconds),
+        }
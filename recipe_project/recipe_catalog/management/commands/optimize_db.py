@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from recipe_catalog import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh SQLite query planner statistics: PRAGMA optimize (cheap, '
+        'run it periodically, e.g. hourly from cron) or a full ANALYZE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Full ANALYZE of every table, e.g. after a bulk import',
+        )
+        parser.add_argument(
+            '--show-pragmas', action='store_true',
+            help='Print the pragmas of the current connection',
+        )
+
+    def handle(self, *args, database, analyze, show_pragmas, **options):
+        connection = connections[database]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'{database} is not a SQLite database')
+        seconds = sqlite.optimize(connection, analyze=analyze)
+        action = 'ANALYZE' if analyze else 'PRAGMA optimize'
+        self.stdout.write(self.style.SUCCESS(f'{action} done in {seconds:.2f}s'))
+        if show_pragmas:
+            for name, value in sqlite.pragmas(connection).items():
+                self.stdout.write(f'{name} = {value}')
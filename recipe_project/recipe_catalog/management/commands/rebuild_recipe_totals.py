@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from recipe_catalog import signals
+from recipe_catalog.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recalculate denormalized recipe totals (price, weights, ingredients count)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Recipes per UPDATE statement and transaction',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        bounds = Recipe.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No recipes')
+            return
+        updated = 0
+        # Диапазоны по первичному ключу: без OFFSET и без списка id в памяти
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            # Только строки с другими итогами: у остальных ETag и кеш остаются
+            stale = Recipe.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size
+            ).stale_totals()
+            with transaction.atomic():
+                ids = list(stale.values_list('pk', flat=True))
+                if ids:
+                    # Итоги не входят в поисковые документы
+                    updated += signals.recipes_changed(
+                        Recipe.objects.filter(pk__in=ids), reindex=False
+                    )
+            self.stdout.write(f'{updated} recipes updated', ending='\r')
+        self.stdout.write(self.style.SUCCESS(f'{updated} recipes updated'))
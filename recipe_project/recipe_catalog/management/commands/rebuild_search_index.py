@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe_catalog import search
+from recipe_catalog.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipe full-text search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Recipes indexed per INSERT batch',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if search.get_backend() is None:
+            self.stderr.write('Full-text search is not supported on this database')
+            return
+        started = time.monotonic()
+        with transaction.atomic():
+            search.clear_index()
+            search.index_recipes(Recipe.objects.all(), batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Recipe.objects.count()} recipes '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,86 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe_catalog import pricing
+from recipe_catalog.management.commands.import_catalog import Source
+from recipe_catalog.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Reprice ingredients in bulk: by a percentage or from a price list, '
+        'recording every change in the price history'
+    )
+
+    def add_arguments(self, parser):
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument(
+            '--percent', type=self.percent,
+            help='Change every price by this percentage, e.g. 7 or -2.5',
+        )
+        change.add_argument(
+            '--file',
+            help='CSV or JSONL price list: name, price (matched by ingredient name)',
+        )
+        parser.add_argument(
+            '--source',
+            help='Note stored with the history rows (default: the percentage or file name)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Price list rows per INSERT into the staging table',
+        )
+
+    @staticmethod
+    def percent(value):
+        try:
+            percent = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(value)
+        if not percent.is_finite():
+            raise ValueError(value)
+        return percent
+
+    def handle(self, *args, percent, file, source, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if file is None:
+            try:
+                result = pricing.reprice_by_percent(
+                    percent, source=source or f'{percent:+}%'
+                )
+            except ValueError as error:
+                raise CommandError(error)
+        else:
+            if not os.path.isfile(file):
+                raise CommandError(f'{file}: no such file')
+            result = pricing.reprice_from_rows(
+                self.read_prices(file), source=source or os.path.basename(file),
+                batch_size=batch_size,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.ingredients} ingredients repriced, {result.recipes} recipes '
+            f'updated in {result.seconds:.2f} s'
+        ))
+
+    def read_prices(self, path):
+        field = Ingredient._meta.get_field('price')
+        source = Source(path)
+        try:
+            for number, row in enumerate(source, 1):
+                try:
+                    if isinstance(row, ValidationError):
+                        raise row
+                    if not isinstance(row, dict):
+                        raise ValidationError('expected an object')
+                    name = str(row.get('name') or '').strip()
+                    if not name:
+                        raise ValidationError('name is required')
+                    yield name, field.clean(str(row.get('price') or '').strip(), None)
+                except ValidationError as error:
+                    self.stderr.write(f'row {number}: {"; ".join(error.messages)}')
+        finally:
+            source.close()
@@ -0,0 +1,255 @@
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipe_catalog import search, signals
+from recipe_catalog.models import Ingredient, PriceHistory, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+INGREDIENT_WORDS = (
+    'Salt', 'Sugar', 'Flour', 'Butter', 'Egg', 'Milk', 'Onion', 'Garlic', 'Tomato',
+    'Potato', 'Carrot', 'Rice', 'Pepper', 'Oil', 'Cheese', 'Chicken', 'Beef', 'Pork',
+    'Cream', 'Lemon', 'Basil', 'Parsley', 'Dill', 'Beet', 'Cabbage', 'Mushroom',
+    'Honey', 'Oats', 'Lentils', 'Beans', 'Apple', 'Cinnamon', 'Vinegar', 'Yeast',
+)
+DISHES = (
+    'soup', 'salad', 'pie', 'stew', 'porridge', 'cake', 'pancakes', 'casserole',
+    'risotto', 'curry', 'bread', 'omelette', 'dumplings', 'borscht', 'pilaf',
+)
+ADJECTIVES = (
+    'Quick', 'Classic', 'Spicy', 'Creamy', 'Rustic', 'Summer', 'Winter', 'Crispy',
+    'Grandma\'s', 'Smoky', 'Light', 'Hearty', 'Sweet', 'Tangy', 'Golden',
+)
+WORDS = (
+    'stir', 'bake', 'simmer', 'chop', 'mix', 'season', 'serve', 'slowly', 'until',
+    'golden', 'tender', 'fresh', 'hot', 'warm', 'with', 'and', 'the', 'add', 'pan',
+    'oven', 'minutes', 'gently', 'boil', 'fry', 'taste', 'garnish', 'rest', 'cool',
+)
+# Все даты отсчитываются от фиксированного момента: одинаковый seed — одинаковая база
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+AUTHOR_PREFIX = 'seed-author-'
+MAX_LINKS = 60
+
+
+@contextmanager
+def _fast_inserts():
+    """On SQLite skip fsync while seeding: after a crash one re-seeds anyway"""
+    # Внутри транзакции (тесты) PRAGMA synchronous менять нельзя
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {previous}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large deterministic synthetic catalog: authors, ingredients '
+        'with Zipf popularity and recipes with a long tail of ingredients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument(
+            '--links', type=float, default=8,
+            help='Mean ingredients per recipe (log-normal, up to %d)' % MAX_LINKS,
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Zipf exponent of ingredient popularity',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Recipes per executemany batch and transaction',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete existing recipes, ingredients and seeded authors first',
+        )
+        parser.add_argument(
+            '--skip-search', action='store_true',
+            help='Do not rebuild the full-text index afterwards',
+        )
+
+    def handle(self, *args, **options):
+        if options['ingredients'] < 1 and options['recipes']:
+            raise CommandError('Recipes need at least one ingredient')
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+        if options['clear']:
+            self.clear()
+        with _fast_inserts():
+            authors = self.seed_authors(options['authors'])
+            ingredients = self.seed_ingredients(rng, options['ingredients'])
+            links = self.seed_recipes(rng, options, authors, ingredients)
+        self.stdout.write('Recalculating totals...')
+        call_command(
+            'rebuild_recipe_totals', batch_size=options['batch_size'], stdout=self.stdout
+        )
+        if not options['skip_search'] and search.get_backend() is not None:
+            call_command('rebuild_search_index', stdout=self.stdout)
+        # После очистки pk начинаются заново: страницы старых рецептов с теми же
+        # pk не должны остаться в кеше
+        signals.invalidate_all_pages()
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["recipes"]} recipes, {len(ingredients)} ingredients, '
+            f'{links} links in {time.monotonic() - started:.1f}s'
+        ))
+
+    def clear(self):
+        with transaction.atomic():
+            for model in (RecipeIngredient, Recipe, PriceHistory, Ingredient):
+                # Без сигналов и каскадов ORM: таблицы очищаются целиком
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {model._meta.db_table}')
+            User.objects.filter(username__startswith=AUTHOR_PREFIX).delete()
+            if search.get_backend() is not None:
+                search.clear_index()
+
+    def seed_authors(self, count):
+        existing = User.objects.filter(username__startswith=AUTHOR_PREFIX).count()
+        password = make_password(None)
+        User.objects.bulk_create(
+            (
+                User(username=f'{AUTHOR_PREFIX}{number}', password=password)
+                for number in range(existing, count)
+            ),
+            batch_size=1000,
+        )
+        return list(
+            User.objects.filter(username__startswith=AUTHOR_PREFIX)
+            .order_by('pk').values_list('pk', flat=True)[:count]
+        )
+
+    def seed_ingredients(self, rng, count):
+        words = len(INGREDIENT_WORDS)
+
+        def name(number):
+            word = INGREDIENT_WORDS[number % words]
+            return word if number < words else f'{word} {number // words + 1}'
+
+        def ingredient(number):
+            weight = rng.randint(5, 1000)
+            return Ingredient(
+                name=name(number), weight=weight,
+                weight_ready=max(1, int(weight * rng.uniform(0.6, 2.5))),
+                price=Decimal(rng.randint(5, 50000)) / 100,
+            )
+
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (ingredient(number) for number in range(count)), batch_size=1000
+            )
+        # Самые популярные — первые по id: Zipf по рангу
+        created = Ingredient.objects.order_by('-pk').values_list('pk', flat=True)[:count]
+        return list(created)[::-1]
+
+    def seed_recipes(self, rng, options, authors, ingredients):
+        count, batch_size = options['recipes'], options['batch_size']
+        if not count:
+            return 0
+        cum_weights = list(accumulate(
+            1 / rank ** options['zipf'] for rank in range(1, len(ingredients) + 1)
+        ))
+        sigma = 0.75
+        mu = math.log(options['links']) - sigma ** 2 / 2
+
+        columns = (
+            'id', 'title', 'description', 'created_at', 'updated_at', 'cooking_time',
+            'author', 'image', 'total_price', 'total_weight', 'total_weight_ready',
+            'ingredients_count',
+        )
+        recipe_sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            Recipe._meta.db_table,
+            ', '.join(
+                connection.ops.quote_name(Recipe._meta.get_field(name).column)
+                for name in columns
+            ),
+            ', '.join(['%s'] * len(columns)),
+        )
+        link_sql = (
+            f'INSERT INTO {RecipeIngredient._meta.db_table} (id, recipe_id, ingredient_id) '
+            'VALUES (%s, %s, %s)'
+        )
+        # Явные id: ссылки строятся без чтения вставленных строк обратно
+        next_recipe = (Recipe.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+        next_link = (RecipeIngredient.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+        # Значения приводятся к виду БД заранее: get_db_prep_save на каждую
+        # ячейку занимал больше времени, чем сама вставка
+        def to_db(name, value):
+            return Recipe._meta.get_field(name).get_db_prep_save(value, connection)
+
+        cooking_times = [
+            to_db('cooking_time', timedelta(minutes=minutes))
+            for minutes in (5, 10, 15, 20, 30, 45, 60, 90, 120)
+        ]
+        zero_price = to_db('total_price', Decimal('0'))
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+
+        links_total = 0
+        started = time.monotonic()
+        for start in range(0, count, batch_size):
+            recipes, links = [], []
+            for _ in range(min(batch_size, count - start)):
+                recipe_id = next_recipe
+                next_recipe += 1
+                created = adapt_datetime(
+                    EPOCH + timedelta(seconds=rng.randrange(3 * 365 * 86400))
+                )
+                recipes.append((
+                    recipe_id,
+                    f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} {recipe_id}',
+                    ' '.join(rng.choices(WORDS, k=rng.randint(8, 40))),
+                    created, created,
+                    rng.choice(cooking_times),
+                    rng.choice(authors) if authors else None,
+                    '', zero_price, 0, 0, 0,
+                ))
+                size = round(rng.lognormvariate(mu, sigma))
+                size = min(MAX_LINKS, len(ingredients), max(1, size))
+                chosen = set(rng.choices(ingredients, cum_weights=cum_weights, k=size))
+                for ingredient_id in sorted(chosen):
+                    links.append((next_link, recipe_id, ingredient_id))
+                    next_link += 1
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(recipe_sql, recipes)
+                cursor.executemany(link_sql, links)
+            links_total += len(links)
+            done = start + len(recipes)
+            rate = done / (time.monotonic() - started)
+            self.stdout.write(
+                f'{done} recipes, {links_total} links, {rate:.0f} recipes/s', ending='\r'
+            )
+        self.stdout.write('')
+
+        # PostgreSQL: после явных id последовательности нужно сдвинуть
+        reset_sql = connection.ops.sequence_reset_sql(no_style(), [Recipe, RecipeIngredient])
+        if reset_sql:
+            with connection.cursor() as cursor:
+                for sql in reset_sql:
+                    cursor.execute(sql)
+        return links_total
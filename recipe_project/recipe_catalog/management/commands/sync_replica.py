@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from recipe_catalog import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh the local read-only replica (SQLITE_REPLICA) from the primary '
+        'SQLite database, once or every --interval seconds'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', default=settings.SQLITE_REPLICA,
+            help='Replica file (default: SQLITE_REPLICA)',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between syncs; keep below REPLICA_MAX_LAG (0 = sync once)',
+        )
+
+    def handle(self, *args, target, interval, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Only a SQLite primary can be copied to a local replica')
+        if not target:
+            raise CommandError('Set SQLITE_REPLICA or pass --target')
+        while True:
+            started = time.monotonic()
+            # Копия во временный файл и rename: читатели видят старую или новую базу целиком
+            seconds = sqlite.backup(connection, target)
+            self.stdout.write(f'{target} synced in {seconds:.2f}s')
+            if not interval:
+                return
+            # Между копиями не держим соединение с primary
+            connection.close()
+            time.sleep(max(0, interval - (time.monotonic() - started)))
@@ -0,0 +1,157 @@
+import argparse
+import gc
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from recipe_catalog import warmup
+
+
+def _get(application, path, host):
+    """GET through the WSGI application as gunicorn calls it, return the status"""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SCRIPT_NAME': '', 'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+def _first_requests(application, paths, host):
+    """{path: [first ms, second ms]} of a fresh process"""
+    timings = {}
+    for path in paths:
+        timings[path] = []
+        for _ in range(2):
+            started = time.perf_counter()
+            status = _get(application, path, host)
+            timings[path].append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            raise CommandError(f'{path}: HTTP {status}')
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        'Warm up templates, URL resolvers and lookup tables as the gunicorn '
+        'master does before forking; --measure compares the first requests '
+        'of cold and of warmed-up, forked worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--measure', action='store_true',
+            help='Start fresh processes and time their boot and first requests',
+        )
+        parser.add_argument('--runs', type=int, default=5, help='Processes per mode')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request (repeatable, default: /, /about/, /api/recipes/)',
+        )
+        parser.add_argument('--host', default='localhost', help='Host header of the requests')
+        # Служебные: так команда запускает сама себя в новом процессе
+        parser.add_argument('--probe', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+        parser.add_argument('--started', type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, measure, runs, paths, host, probe, started, **options):
+        paths = paths or ['/', '/about/', '/api/recipes/']
+        if probe:
+            self.probe(probe, started, paths, host)
+        elif measure:
+            if runs < 1:
+                raise CommandError('--runs must be positive')
+            self.measure(runs, paths, host)
+        else:
+            for step, (result, ms) in warmup.warm_up().items():
+                count = '' if result is None else f'{result:5}  '
+                self.stdout.write(f'{step:20} {count}{ms:8.1f} ms')
+
+    def probe(self, mode, started, paths, host):
+        """One process: boot, then the first requests; a JSON line on stdout"""
+        # Как gunicorn: приложение (и middleware) создаётся при загрузке,
+        # с preload — ещё в мастере
+        application = get_wsgi_application()
+        if mode == 'cold':
+            # Без preload каждый воркер сам импортирует Django и открывает базу
+            warmup.connect()
+            result = {'boot_ms': (time.time() - started) * 1000}
+        else:
+            warmup.warm_up()
+            gc.freeze()
+            result = {'master_ms': (time.time() - started) * 1000}
+            read, write = os.pipe()
+            forked = time.perf_counter()
+            pid = os.fork()
+            if pid:
+                os.close(write)
+                with os.fdopen(read) as pipe:
+                    self.stdout.write(pipe.read())
+                os.waitpid(pid, 0)
+                return
+            os.close(read)
+            warmup.connect()
+            result['boot_ms'] = (time.perf_counter() - forked) * 1000
+        try:
+            result['requests'] = _first_requests(application, paths, host)
+            output = json.dumps(result)
+        except CommandError as error:
+            output = json.dumps({'error': str(error)})
+        if mode == 'cold':
+            self.stdout.write(output)
+        else:
+            with os.fdopen(write, 'w') as pipe:
+                pipe.write(output)
+            os._exit(0)
+
+    def measure(self, runs, paths, host):
+        results = {'cold': [], 'warm': []}
+        for _ in range(runs):
+            for mode, probes in results.items():
+                command = [
+                    sys.executable, '-m', 'django', 'warmup', '--probe', mode,
+                    '--started', str(time.time()), '--host', host,
+                    *(f'--path={path}' for path in paths),
+                ]
+                process = subprocess.run(
+                    command, cwd=settings.BASE_DIR, capture_output=True, text=True
+                )
+                if process.returncode:
+                    raise CommandError(process.stderr.strip().splitlines()[-1])
+                probe = json.loads(process.stdout.strip().splitlines()[-1])
+                if 'error' in probe:
+                    raise CommandError(probe['error'])
+                probes.append(probe)
+
+        for mode, probes in results.items():
+            line = f'{mode}: worker boot {statistics.median(p["boot_ms"] for p in probes):8.1f} ms'
+            if mode == 'warm':
+                master = statistics.median(p['master_ms'] for p in probes)
+                line += f' (fork + connect; master start with warm-up {master:.1f} ms)'
+            self.stdout.write(line)
+            for path in paths:
+                first, second = (
+                    statistics.median(p['requests'][path][i] for p in probes) for i in range(2)
+                )
+                self.stdout.write(
+                    f'  {path:30} first request {first:8.2f} ms   second {second:8.2f} ms'
+                )
+        self.stdout.write(f'medians of {runs} processes per mode')
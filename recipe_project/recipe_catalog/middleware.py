@@ -0,0 +1,391 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotFound, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_sequence, compress_string
+from django.views.static import was_modified_since
+
+from .storage import compressors, is_static_hashed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('recipe_catalog.sql')
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'\(\?(?:, ?\?)+\)')
+_SPACES = re.compile(r'\s+')
+
+# Сжатие на лету: 11 (как в collectstatic) на каждый ответ слишком медленно
+BROTLI_QUALITY = 5
+
+
+def normalize_sql(sql):
+    """Query shape: literals and placeholders become ?, IN lists collapse"""
+    sql = _LITERAL.sub('?', sql.replace('%s', '?'))
+    return _SPACES.sub(' ', _IN_LIST.sub('(...)', sql)).strip()
+
+
+class DuplicateQueriesError(AssertionError):
+    pass
+
+
+class QueryStats:
+    """execute_wrapper that counts and times the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Сырые строки SQL: нормализуем один раз в конце, а не на каждый запрос
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """[(shape, count)] of query shapes that ran more than once"""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[normalize_sql(sql)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count > 1]
+
+
+class QueryStatsMiddleware:
+    """
+    Query count, DB time and repeated query shapes of sampled requests.
+
+    Results go to the Server-Timing header and a JSON line on the
+    'recipe_catalog.sql' logger. A shape repeated more than
+    SQL_DUPLICATE_THRESHOLD times (an N+1) is logged as a warning, or
+    raises DuplicateQueriesError when SQL_DUPLICATE_RAISE is set (tests).
+    Queries made while a streaming response is consumed are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_STATS_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        with self.wrap_connections(stats):
+            response = self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_STATS_SAMPLE_RATE:
+            return await self.get_response(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        # ORM асинхронных view работает в потоке sync_to_async, и соединения
+        # там свои: обёртки ставим и снимаем в том же потоке
+        stack = await sync_to_async(self.wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    def wrap_connections(self, stats):
+        """ExitStack with stats wrapped around every connection of this thread"""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            return stack.pop_all()
+
+    def report(self, request, response, stats, total):
+        duplicates = stats.duplicates()
+        response['Server-Timing'] = (
+            f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+            f'dup;desc="{sum(count - 1 for _, count in duplicates)} repeated", '
+            f'total;dur={total * 1000:.2f}'
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.seconds * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates[:5]],
+        }, ensure_ascii=False))
+
+        offenders = [
+            (sql, count) for sql, count in duplicates
+            if count > settings.SQL_DUPLICATE_THRESHOLD
+        ]
+        if offenders:
+            message = f'{request.method} {request.path} repeats queries: ' + '; '.join(
+                f'{count}x {sql}' for sql, count in offenders
+            )
+            if settings.SQL_DUPLICATE_RAISE:
+                raise DuplicateQueriesError(message)
+            logger.warning(message)
+        return response
+
+
+def accepted_encodings(header):
+    """Content codings of an Accept-Encoding header, without those with q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = next((p[2:] for p in params if p.startswith('q=')), '1')
+        try:
+            if coding and float(quality) > 0:
+                accepted.add(coding.lower())
+        except ValueError:
+            pass
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Serves STATIC_ROOT from the Django process when nothing in front of it
+    does (SERVE_STATIC), before sessions, auth and the SQL stats run.
+
+    Like nginx with gzip_static it sends the precompressed .br/.gz copy
+    written by collectstatic if the client accepts it. Names hashed by the
+    manifest storage never change and are cached for a year as immutable;
+    any other name gets STATIC_MAX_AGE and is revalidated by Last-Modified.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        name = self.static_name(request)
+        if name is not None:
+            return self.serve(request, name)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        name = self.static_name(request)
+        if name is not None:
+            # stat и open блокируют: как ASGIStaticFilesHandler, уходим в поток
+            return await sync_to_async(self.serve, thread_sensitive=False)(request, name)
+        return await self.get_response(request)
+
+    def static_name(self, request):
+        """Name under STATIC_ROOT for a static GET or HEAD, else None"""
+        prefix = urlsplit(settings.STATIC_URL).path
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(prefix):
+            return request.path_info[len(prefix):]
+        return None
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return HttpResponseNotFound()
+        if not name or not os.path.isfile(path):
+            return HttpResponseNotFound()
+
+        path, encoding, variants = self.select_variant(request, path)
+        mtime = os.stat(path).st_mtime
+        if not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            response = FileResponse(
+                open(path, 'rb'), content_type=content_type, filename=os.path.basename(name)
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        return self.add_headers(response, name, mtime, variants)
+
+    def select_variant(self, request, path):
+        """(path, coding or None, whether precompressed copies exist)"""
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        variants = False
+        for suffix, coding, _ in compressors():
+            if os.path.isfile(path + suffix):
+                if coding in accepted:
+                    return path + suffix, coding, True
+                variants = True
+        return path, None, variants
+
+    def add_headers(self, response, name, mtime, variants):
+        response['Last-Modified'] = http_date(mtime)
+        if variants:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if is_static_hashed(name):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}'
+        return response
+
+
+class ResponseSizes:
+    """Body bytes per URL route before and after compression, in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route, size, sent):
+        with self._lock:
+            totals = self._routes.setdefault(route, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += size
+            totals[2] += sent
+
+    def report(self):
+        with self._lock:
+            routes = sorted(self._routes.items(), key=lambda item: -item[1][1])
+        return {
+            route: {
+                'responses': responses,
+                'bytes': size,
+                'sent_bytes': sent,
+                'ratio': round(sent / size, 3) if size else 1.0,
+            }
+            for route, (responses, size, sent) in routes
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+response_sizes = ResponseSizes()
+UNRESOLVED_ROUTE = '<unresolved>'
+
+
+def _brotli_sequence(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses COMPRESS_CONTENT_TYPES responses (HTML, JSON, exports).
+
+    Brotli is used when installed and accepted, except on pages with a CSRF
+    token: those get gzip with the random padding GZipMiddleware adds
+    against BREACH. Bodies under COMPRESS_MIN_SIZE are sent as they are,
+    streaming responses are compressed as they go. Body bytes before and
+    after are added up per route in response_sizes.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        skip = response.has_header('Content-Encoding') or getattr(response, 'is_async', False)
+        if skip or content_type not in settings.COMPRESS_CONTENT_TYPES:
+            return response
+        match = request.resolver_match
+        # 404 и прочие ответы мимо маршрутов — одна строка, а не по строке на адрес
+        route = match.route if match else UNRESOLVED_ROUTE
+
+        if response.streaming:
+            patch_vary_headers(response, ['Accept-Encoding'])
+            coding = self.coding(request)
+            if coding:
+                del response.headers['Content-Length']
+                self.mark_encoded(response, coding)
+            response.streaming_content = self.stream(
+                route, response.streaming_content, coding
+            )
+            return response
+
+        size = len(response.content)
+        if size >= settings.COMPRESS_MIN_SIZE:
+            patch_vary_headers(response, ['Accept-Encoding'])
+            coding = self.coding(request)
+            compressed = self.compress(response.content, coding)
+            if compressed is not None and len(compressed) < size:
+                response.content = compressed
+                response.headers['Content-Length'] = str(len(compressed))
+                self.mark_encoded(response, coding)
+        response_sizes.add(route, size, len(response.content))
+        return response
+
+    def coding(self, request):
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        # get_token() отметил, что в странице есть CSRF-токен
+        csrf = request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        if 'br' in accepted and brotli is not None and not csrf:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def compress(self, content, coding):
+        if coding == 'br':
+            return brotli.compress(content, quality=BROTLI_QUALITY)
+        if coding == 'gzip':
+            return compress_string(content, max_random_bytes=self.max_random_bytes)
+        return None
+
+    @staticmethod
+    def mark_encoded(response, coding):
+        # Сжатое тело уже не байт в байт то же: сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+
+    def stream(self, route, chunks, coding):
+        size = sent = 0
+
+        def counted():
+            nonlocal size
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+
+        if coding == 'br':
+            body = _brotli_sequence(counted())
+        elif coding == 'gzip':
+            body = compress_sequence(counted(), max_random_bytes=self.max_random_bytes)
+        else:
+            body = counted()
+        for data in body:
+            sent += len(data)
+            yield data
+        response_sizes.add(route, size, sent)
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Recipe = apps.get_model('recipe_catalog', 'Recipe')
+    RecipeIngredient = apps.get_model('recipe_catalog', 'RecipeIngredient')
+    links = RecipeIngredient.objects.filter(recipe=OuterRef('pk')).values('recipe')
+
+    def total(expression, output_field, empty):
+        subquery = Subquery(
+            links.annotate(total=expression).values('total'),
+            output_field=output_field,
+        )
+        return Coalesce(subquery, Value(empty), output_field=output_field)
+
+    Recipe.objects.update(
+        total_price=total(Sum('ingredient__price'), models.DecimalField(), Decimal('0.00')),
+        total_weight=total(Sum('ingredient__weight'), models.PositiveIntegerField(), 0),
+        total_weight_ready=total(
+            Sum('ingredient__weight_ready'), models.PositiveIntegerField(), 0
+        ),
+        ingredients_count=total(Count('ingredient'), models.PositiveIntegerField(), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0005_alter_recipe_title_recipe_recipe_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_weight',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_weight_ready',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['total_price', 'id'], name='recipe_total_price_id_idx'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
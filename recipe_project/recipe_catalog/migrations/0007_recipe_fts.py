@@ -0,0 +1,74 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+FTS_TABLE = 'recipe_catalog_recipe_fts'
+
+CREATE_SQL = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, ingredients, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {FTS_TABLE} ('
+        'recipe_id bigint PRIMARY KEY '
+        'REFERENCES recipe_catalog_recipe (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        'document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {FTS_TABLE}_document_idx '
+        f'ON {FTS_TABLE} USING GIN (document)',
+    ],
+}
+
+INSERT_SQL = {
+    'sqlite': (
+        f'INSERT INTO {FTS_TABLE} (rowid, title, description, ingredients) '
+        'VALUES (%s, %s, %s, %s)'
+    ),
+    'postgresql': (
+        f'INSERT INTO {FTS_TABLE} (recipe_id, document) VALUES (%s, '
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'B'))"
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        return
+    for sql in CREATE_SQL[vendor]:
+        schema_editor.execute(sql)
+
+    Recipe = apps.get_model('recipe_catalog', 'Recipe')
+    RecipeIngredient = apps.get_model('recipe_catalog', 'RecipeIngredient')
+    names = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient__name'
+    ).iterator():
+        names[recipe_id].append(name)
+    documents = [
+        (pk, title, description, ' '.join(names[pk]))
+        for pk, title, description in Recipe.objects.values_list(
+            'pk', 'title', 'description'
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL[vendor], documents)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0006_recipe_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
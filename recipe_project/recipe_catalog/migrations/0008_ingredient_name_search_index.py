@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEX_NAME = 'recipe_catalog_ingredient_name_ci_idx'
+
+# Индексы под name__istartswith: SQLite применяет к LIKE индекс с NOCASE,
+# PostgreSQL сравнивает UPPER("name"::text) LIKE UPPER(%s)
+CREATE_SQL = {
+    'sqlite': (
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        'ON recipe_catalog_ingredient (name COLLATE NOCASE)'
+    ),
+    'postgresql': (
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        'ON recipe_catalog_ingredient (UPPER(name::text) text_pattern_ops)'
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = CREATE_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0007_recipe_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
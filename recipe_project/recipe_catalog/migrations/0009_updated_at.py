@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:07
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def updated_from_created(apps, schema_editor):
+    Recipe = apps.get_model('recipe_catalog', 'Recipe')
+    Recipe.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0008_ingredient_name_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(updated_from_created, migrations.RunPython.noop),
+    ]
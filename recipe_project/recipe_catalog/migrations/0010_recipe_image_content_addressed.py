@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import recipe_catalog.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=recipe_catalog.storage.recipe_image_storage, upload_to='recipe_images/'),
+        ),
+    ]
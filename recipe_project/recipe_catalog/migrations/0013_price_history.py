@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0012_recipe_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='recipe_catalog.ingredient')),
+            ],
+            options={
+                'verbose_name_plural': 'price history',
+                'indexes': [models.Index(fields=['ingredient', 'changed_at'], name='price_history_ingredient_idx')],
+            },
+        ),
+    ]
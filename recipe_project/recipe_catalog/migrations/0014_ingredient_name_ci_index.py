@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import recipe_catalog.models
+
+# Индекс из 0008 жил только в сыром SQL: пересборка таблицы в 0009 удалила
+# его у SQLite. Теперь он в Meta.indexes модели, старый убираем, если остался
+OLD_INDEX_NAME = 'recipe_catalog_ingredient_name_ci_idx'
+OLD_CREATE_SQL = {
+    'sqlite': (
+        f'CREATE INDEX IF NOT EXISTS {OLD_INDEX_NAME} '
+        'ON recipe_catalog_ingredient (name COLLATE NOCASE)'
+    ),
+    'postgresql': (
+        f'CREATE INDEX IF NOT EXISTS {OLD_INDEX_NAME} '
+        'ON recipe_catalog_ingredient (UPPER(name::text) text_pattern_ops)'
+    ),
+}
+
+
+def drop_old_index(apps, schema_editor):
+    if schema_editor.connection.vendor in OLD_CREATE_SQL:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {OLD_INDEX_NAME}')
+
+
+def create_old_index(apps, schema_editor):
+    sql = OLD_CREATE_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_catalog', '0013_price_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_old_index, create_old_index),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                recipe_catalog.models.CaseInsensitive('name'), name='ingredient_name_ci_idx'
+            ),
+        ),
+    ]
@@ -1,24 +1,128 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Count, F, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
+from .storage import recipe_image_storage
 
 User = get_user_model()
 
+class CaseInsensitive(Func):
+    """
+    Index expression under name__istartswith: SQLite's LIKE uses an index
+    on `name COLLATE NOCASE`, PostgreSQL compares UPPER(name::text) (its
+    LIKE uses that index with the C collation of the database).
+    """
+    template = '%(expressions)s COLLATE NOCASE'
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='UPPER(%(expressions)s::text)', **extra_context
+        )
+
+
 # Create your models here.
 class Ingredient(models.Model):
+    # Индекс ingredient_name_ci_idx (Meta) держит автодополнение и поиск в админке
     name = models.CharField(max_length=255)
     weight = models.PositiveIntegerField()
     weight_ready = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Поля, от которых зависят данные рецептов (итоги Recipe.total_*, поиск)
+    RECIPE_FIELDS = ('name', 'weight', 'weight_ready', 'price')
+
+    class Meta:
+        indexes = [
+            # В состоянии моделей, а не сырым SQL: пересборка таблицы SQLite
+            # (AddField, AlterField) создаёт его заново
+            models.Index(CaseInsensitive('name'), name='ingredient_name_ci_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженные значения, чтобы после save() понять,
+        # нужно ли обновлять рецепты с этим ингредиентом
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.RECIPE_FIELDS
+        }
+        return instance
+
+    def recipe_fields_changed(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(getattr(self, name) != value for name, value in loaded.items())
+
+
+def _recipe_totals():
+    """{field: expression} of every denormalized total of a recipe"""
+    links = RecipeIngredient.objects.filter(recipe=OuterRef('pk')).values('recipe')
+
+    def total(expression, output_field, empty):
+        subquery = Subquery(
+            links.annotate(total=expression).values('total'),
+            output_field=output_field,
+        )
+        return Coalesce(subquery, Value(empty), output_field=output_field)
+
+    return {
+        'total_price': total(
+            Sum('ingredient__price'), models.DecimalField(), Decimal('0.00')
+        ),
+        'total_weight': total(
+            Sum('ingredient__weight'), models.PositiveIntegerField(), 0
+        ),
+        'total_weight_ready': total(
+            Sum('ingredient__weight_ready'), models.PositiveIntegerField(), 0
+        ),
+        'ingredients_count': total(
+            Count('ingredient'), models.PositiveIntegerField(), 0
+        ),
+    }
+
+
+class RecipeQuerySet(models.QuerySet):
+    def update_totals(self):
+        """Recalculate denormalized totals for the recipes in one UPDATE"""
+        return self.update(
+            **_recipe_totals(),
+            # Состав или цены поменялись: страница рецепта тоже
+            updated_at=timezone.now(),
+        )
+
+    def stale_totals(self):
+        """The recipes whose stored totals differ from their ingredients"""
+        totals = _recipe_totals()
+        # SQLite суммирует цены во float: сравниваем с точностью до копеек
+        totals['total_price'] = Round(totals['total_price'], 2)
+        return self.alias(
+            stored_price=Round('total_price', 2),
+            **{f'fresh_{name}': expression for name, expression in totals.items()},
+        ).exclude(
+            stored_price=F('fresh_total_price'),
+            total_weight=F('fresh_total_weight'),
+            total_weight_ready=F('fresh_total_weight_ready'),
+            ingredients_count=F('fresh_ingredients_count'),
+        )
+
 class Recipe(models.Model):
-    title = models.CharField(max_length=300, db_index=True)
+    title = models.CharField(max_length=300)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to='recipe_images/', blank=True, null=True)
+    # Двигается и при изменении ингредиентов, см. update_totals
+    updated_at = models.DateTimeField(auto_now=True)
+    image = models.ImageField(
+        upload_to='recipe_images/', storage=recipe_image_storage, blank=True, null=True
+    )
     cooking_time = models.DurationField(default=timedelta(minutes=5))
     ingredients = models.ManyToManyField(Ingredient, through='RecipeIngredient')
     author = models.ForeignKey(
@@ -27,10 +131,38 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         null=True
     )
+    # Денормализованные итоги по ингредиентам, см. RecipeQuerySet.update_totals
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+    total_weight = models.PositiveIntegerField(default=0, editable=False)
+    total_weight_ready = models.PositiveIntegerField(default=0, editable=False)
+    ingredients_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Старый файл освобождается после замены картинки, см. signals
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
+    class Meta:
+        indexes = [
+            # Keyset pagination on the index page seeks by (title, id)
+            models.Index(fields=['title', 'id'], name='recipe_title_id_idx'),
+            models.Index(
+                fields=['total_price', 'id'], name='recipe_total_price_id_idx'
+            ),
+            # Индекс кладовой ищет рецепты, изменённые после его построения
+            models.Index(fields=['updated_at'], name='recipe_updated_at_idx'),
+        ]
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
@@ -48,3 +180,42 @@ class RecipeIngredient(models.Model):
         indexes = [
             models.Index(fields=['recipe', 'ingredient'])
         ]
+
+
+class ImportCheckpoint(models.Model):
+    """Where manage.py import_catalog stopped in a source file"""
+    # Пишется в той же транзакции, что и пачка строк: после сбоя
+    # импорт продолжается ровно с первой незакоммиченной строки
+    source = models.CharField(max_length=1024, unique=True)
+    offset = models.PositiveBigIntegerField(default=0)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source}: {self.rows} rows'
+
+
+class PriceHistory(models.Model):
+    """One price change of an ingredient, see recipe_catalog.pricing"""
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='price_history'
+    )
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Одно время у всех строк одной переоценки
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+    source = models.CharField(max_length=255, blank=True)
+    # Строки одной переоценки: время могут разделить и чужие переоценки
+    batch = models.UUIDField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f'{self.ingredient_id}: {self.old_price} -> {self.new_price}'
+
+    class Meta:
+        verbose_name_plural = 'price history'
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'changed_at'], name='price_history_ingredient_idx'
+            ),
+            models.Index(fields=['batch', 'ingredient'], name='price_history_batch_idx'),
+        ]
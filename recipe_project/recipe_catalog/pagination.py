@@ -0,0 +1,186 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(direction, values):
+    """Pack direction and ordering key values into an opaque url-safe token"""
+    payload = json.dumps(
+        [direction, [str(v) if isinstance(v, Decimal) else v for v in values]],
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (direction, values) or None for a missing or broken cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if direction not in ('n', 'p') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class CursorPage:
+    """One page of a keyset paginated queryset, behaves like a sequence"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over `ordering` (ascending, last field must be unique).
+
+    Unlike Paginator it never runs COUNT(*) and never uses OFFSET, so every
+    page costs one index range scan of per_page + 1 rows.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+
+    def _seek(self, values, lookup):
+        # (a, b) > (x, y)  ->  a > x OR (a = x AND b > y)
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal = {f: v for f, v in zip(self.ordering[:i], values[:i])}
+            condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+        return condition
+
+    def _clean(self, values):
+        # Курсор приходит из URL: значения приводим к типам полей
+        if len(values) != len(self.ordering) or None in values:
+            raise ValidationError('Cursor does not match ordering')
+        opts = self.queryset.model._meta
+        return [
+            opts.get_field(field).to_python(value)
+            for field, value in zip(self.ordering, values)
+        ]
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field in self.ordering]
+
+    def _query(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded is not None:
+            try:
+                decoded = decoded[0], self._clean(decoded[1])
+            except ValidationError:
+                decoded = None
+        limit = self.per_page + 1
+
+        if decoded is None:
+            queryset = self.queryset.order_by(*self.ordering)
+        elif decoded[0] == 'n':
+            queryset = self.queryset.filter(self._seek(decoded[1], 'gt')).order_by(*self.ordering)
+        else:
+            queryset = self.queryset.filter(self._seek(decoded[1], 'lt')).order_by(
+                *[f'-{field}' for field in self.ordering]
+            )
+        return queryset[:limit], None if decoded is None else decoded[0]
+
+    def _page(self, rows, direction):
+        more = len(rows) > self.per_page
+        items = rows[:self.per_page]
+        if direction is None:
+            has_next, has_previous = more, False
+        elif direction == 'n':
+            has_next, has_previous = more, True
+        else:
+            has_next, has_previous = True, more
+            items = items[::-1]
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = encode_cursor('n', self._key(items[-1]))
+        if items and has_previous:
+            previous_cursor = encode_cursor('p', self._key(items[0]))
+        return CursorPage(items, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        queryset, direction = self._query(cursor)
+        return self._page(list(queryset), direction)
+
+    async def aget_page(self, cursor=None):
+        queryset, direction = self._query(cursor)
+        return self._page([obj async for obj in queryset], direction)
+
+
+def estimated_count(queryset):
+    """Planner statistics' row count of the queryset's table, None if unknown"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table]
+            )
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 заполняют ANALYZE и PRAGMA optimize (manage.py optimize_db)
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+            except DatabaseError:
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL отдаёт -1 для ни разу не проанализированной таблицы
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the count of an unfiltered queryset from planner
+    statistics instead of a COUNT(*) over the whole table; filtered
+    querysets are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None:
+                return estimate
+        return super().count
@@ -0,0 +1,253 @@
+"""
+"What can I cook?": recipes ranked by how much of a pantry they cover.
+
+An in-memory inverted index maps every ingredient to the set of recipes
+using it, as a Python int bitset (bit N = recipe N); rare ingredients are
+kept as id arrays and turned into bitsets on demand. A query adds the sets
+of the pantry's ingredients into bit-sliced counters and subtracts them
+from the recipes' ingredient counts (also bit-sliced), so finding recipes
+with at most k missing ingredients is a few dozen big-int operations
+instead of a GROUP BY over every RecipeIngredient row.
+
+Recipes changed after the index was built live in a small overlay that is
+checked directly; past PANTRY_OVERLAY_LIMIT the index is rebuilt. Every
+process keeps its own index and picks up changes by polling
+Recipe.updated_at, which update_totals moves on every change of links.
+A deletion moves nothing, so a poll also compares the number of recipes
+with the ids the index knows and, when they differ, drops the missing ones.
+"""
+import heapq
+import threading
+import time
+from array import array
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import routers
+from .models import Recipe, RecipeIngredient
+
+PantryMatch = namedtuple('PantryMatch', 'recipe_id missing present')
+
+
+def _bitset(ids, size):
+    bits = bytearray((size + 7) // 8)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _bit_ids(bits, limit):
+    """Up to limit set bit positions, highest (newest recipe) first"""
+    ids = []
+    while bits and len(ids) < limit:
+        position = bits.bit_length() - 1
+        ids.append(position)
+        bits ^= 1 << position
+    return ids
+
+
+def _add(counters, bits):
+    """Add a 0/1 bitset to bit-sliced counters in place"""
+    for j, plane in enumerate(counters):
+        if not bits:
+            return
+        counters[j], bits = plane ^ bits, plane & bits
+    if bits:
+        counters.append(bits)
+
+
+def _subtract(minuend, subtrahend):
+    """Bit-sliced minuend - subtrahend, every value of the result >= 0"""
+    width = max(len(minuend), len(subtrahend))
+    result, borrow = [], 0
+    for j in range(width):
+        a = minuend[j] if j < len(minuend) else 0
+        b = subtrahend[j] if j < len(subtrahend) else 0
+        result.append(a ^ b ^ borrow)
+        borrow = (~a & (b | borrow)) | (b & borrow)
+    return result
+
+
+def _equal(planes, value, within):
+    """Bits of `within` whose bit-sliced value equals value"""
+    if value >> len(planes):
+        return 0
+    for j, plane in enumerate(planes):
+        within &= plane if value >> j & 1 else ~plane
+        if not within:
+            break
+    return within
+
+
+class _Base:
+    """Immutable index of every link at build time"""
+
+    def __init__(self):
+        links = defaultdict(lambda: array('I'))
+        counts = defaultdict(int)
+        rows = RecipeIngredient.objects.values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in rows.iterator(chunk_size=20000):
+            links[ingredient_id].append(recipe_id)
+            counts[recipe_id] += 1
+        self.size = max(counts, default=0) + 1
+        # Битсет стоит size/8 байт при любой заполненности, массив — 4 байта на id
+        dense_from = self.size // 32
+        self.dense = {
+            ingredient_id: _bitset(ids, self.size)
+            for ingredient_id, ids in links.items() if len(ids) > dense_from
+        }
+        self.sparse = {
+            ingredient_id: ids
+            for ingredient_id, ids in links.items() if len(ids) <= dense_from
+        }
+        # Число ингредиентов рецепта по битовым плоскостям
+        width = max(counts.values(), default=0).bit_length()
+        planes = [bytearray((self.size + 7) // 8) for _ in range(width)]
+        for recipe_id, count in counts.items():
+            for j in range(count.bit_length()):
+                if count >> j & 1:
+                    planes[j][recipe_id >> 3] |= 1 << (recipe_id & 7)
+        self.counts = [int.from_bytes(plane, 'little') for plane in planes]
+        self.links = sum(len(ids) for ids in links.values())
+
+    def recipes_with(self, ingredient_id):
+        if ingredient_id in self.dense:
+            return self.dense[ingredient_id]
+        return _bitset(self.sparse.get(ingredient_id, ()), self.size)
+
+
+class PantryIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_sync = 0.0
+        self._since = None
+        # (база, {recipe_id: frozenset ингредиентов} изменённых, их битсет)
+        self._state = None
+        # Битсет id всех рецептов, известных индексу
+        self._alive = 0
+
+    def reset(self):
+        with self._lock:
+            self._state = None
+
+    def expire(self):
+        """Look for changed recipes on the next query"""
+        self._next_sync = 0.0
+
+    def forget(self, recipe_ids):
+        """Drop deleted recipes (a deletion does not move any updated_at)"""
+        with self._lock:
+            if self._state is not None:
+                self._alive &= ~_bitset(recipe_ids, max(recipe_ids, default=0) + 1)
+                self._update({recipe_id: frozenset() for recipe_id in recipe_ids})
+
+    def _update(self, changed):
+        base, overlay, stale = self._state
+        stale |= _bitset(changed, max(changed, default=0) + 1)
+        self._state = base, {**overlay, **changed}, stale
+
+    def _rebuild(self):
+        started = timezone.now()
+        self._state = _Base(), {}, 0
+        self._alive = self._recipe_ids()
+        self._since = started
+
+    def _recipe_ids(self):
+        ids = list(Recipe.objects.values_list('pk', flat=True).iterator(chunk_size=20000))
+        return _bitset(ids, max(ids, default=0) + 1)
+
+    def _deleted(self, recipe_ids):
+        """Known recipes that are gone from the database, e.g. deleted elsewhere"""
+        self._alive |= _bitset(recipe_ids, max(recipe_ids, default=0) + 1)
+        if Recipe.objects.count() == self._alive.bit_count():
+            return []
+        current = self._recipe_ids()
+        gone = self._alive & ~current
+        self._alive = current
+        return _bit_ids(gone, gone.bit_count())
+
+    def _poll(self):
+        started = timezone.now()
+        slack = timedelta(seconds=settings.PANTRY_SYNC_SLACK)
+        # Свежие изменения есть только на primary
+        with routers.use_primary():
+            recipe_ids = list(Recipe.objects.filter(
+                updated_at__gte=self._since - slack
+            ).values_list('pk', flat=True))
+            deleted = self._deleted(recipe_ids)
+            pending = len(self._state[1]) + len(recipe_ids) + len(deleted)
+            if pending > settings.PANTRY_OVERLAY_LIMIT:
+                self._rebuild()
+                return
+            changed = {recipe_id: set() for recipe_id in deleted}
+            changed.update((recipe_id, set()) for recipe_id in recipe_ids)
+            links = RecipeIngredient.objects.filter(
+                recipe__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id')
+            for recipe_id, ingredient_id in links:
+                changed[recipe_id].add(ingredient_id)
+        self._update({key: frozenset(value) for key, value in changed.items()})
+        self._since = started
+
+    def _sync(self):
+        if self._state is not None and time.monotonic() < self._next_sync:
+            return self._state
+        with self._lock:
+            if self._state is None:
+                self._rebuild()
+            elif time.monotonic() >= self._next_sync:
+                self._poll()
+            self._next_sync = time.monotonic() + settings.PANTRY_SYNC_SECONDS
+            return self._state
+
+    def search(self, ingredient_ids, max_missing=0, limit=50):
+        """
+        Return (matches, total): recipes using any of the ingredients and
+        missing at most max_missing others, fewest missing first, then
+        most pantry ingredients used, then newest.
+        """
+        pantry = frozenset(ingredient_ids)
+        base, overlay, stale = self._sync()
+        if not pantry:
+            return [], 0
+
+        present = []
+        for ingredient_id in pantry:
+            _add(present, base.recipes_with(ingredient_id))
+        candidates = 0
+        for plane in present:
+            candidates |= plane
+        candidates &= ~stale
+        missing = _subtract(base.counts, present)
+
+        ranked, total = [], 0
+        for lacking in range(max_missing + 1):
+            group = _equal(missing, lacking, candidates)
+            total += group.bit_count()
+            for used in range(len(pantry), 0, -1):
+                if not group or len(ranked) >= limit:
+                    break
+                level = _equal(present, used, group)
+                group &= ~level
+                ranked.extend(
+                    (lacking, -used, -recipe_id)
+                    for recipe_id in _bit_ids(level, limit - len(ranked))
+                )
+
+        extra = []
+        for recipe_id, ingredients in overlay.items():
+            used = len(ingredients & pantry)
+            if used and len(ingredients) - used <= max_missing:
+                extra.append((len(ingredients) - used, -used, -recipe_id))
+        total += len(extra)
+        merged = heapq.merge(ranked, sorted(extra))
+        return [
+            PantryMatch(-recipe_id, lacking, -used)
+            for lacking, used, recipe_id in list(merged)[:limit]
+        ], total
+
+
+index = PantryIndex()
@@ -0,0 +1,102 @@
+"""
+Set-based repricing of ingredients.
+
+No ingredient is save()d one by one. The changes are first written to
+PriceHistory with a single INSERT ... SELECT, either from the ingredient
+table itself (reprice_by_percent) or from a temporary staging table of
+new prices joined by name (reprice_from_rows). One UPDATE then applies
+them, reading the new prices back from those history rows. Totals and
+cached pages of the affected recipes are refreshed once, at the end.
+"""
+import time
+import uuid
+from collections import namedtuple
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Ingredient, PriceHistory
+from .signals import ingredients_changed
+
+STAGING_TABLE = 'recipe_catalog_price_staging'
+
+RepriceResult = namedtuple('RepriceResult', 'ingredients recipes seconds')
+
+
+def _apply(cursor, changes_sql, params, source, started):
+    """Record (ingredient_id, old_price, new_price) rows of changes_sql and apply them"""
+    changed_at = timezone.now()
+    batch = uuid.uuid4()
+    cursor.execute(
+        f'INSERT INTO {PriceHistory._meta.db_table} '
+        '(ingredient_id, old_price, new_price, changed_at, source, batch) '
+        f'SELECT changes.*, %s, %s, %s FROM ({changes_sql}) changes',
+        [
+            connection.ops.adapt_datetimefield_value(changed_at), source,
+            PriceHistory._meta.get_field('batch').get_db_prep_value(batch, connection),
+            *params,
+        ],
+    )
+    history = PriceHistory.objects.filter(batch=batch)
+    ingredients = Ingredient.objects.filter(pk__in=history.values('ingredient')).update(
+        price=Subquery(history.filter(ingredient=OuterRef('pk')).values('new_price')[:1]),
+        updated_at=changed_at,
+    )
+    # Цены не входят в поисковые документы
+    recipes = ingredients_changed(history.values('ingredient'), reindex=False)
+    return RepriceResult(ingredients, recipes, time.monotonic() - started)
+
+
+def reprice_by_percent(percent, queryset=None, source=''):
+    """Change prices of the ingredients by percent (+7, -10), rounded to cents"""
+    started = time.monotonic()
+    percent = Decimal(percent)
+    if percent <= -100:
+        raise ValueError('A price cannot drop by 100% or more')
+    queryset = Ingredient.objects.all() if queryset is None else queryset
+    # Округление в целых копейках: у SQLite Round(x, 2) работает с float,
+    # и 2.675 стало бы 2.67. Половина копейки округляется вверх, как ROUND_HALF_UP
+    cents = Round(F('price') * 100)
+    factor = Value(100 + percent, output_field=models.DecimalField())
+    new_price = Round(cents * factor / 100) / 100
+    changes = queryset.order_by().annotate(new_price=new_price).exclude(
+        new_price=F('price')
+    ).values_list('pk', 'price', 'new_price')
+    sql, params = changes.query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        return _apply(cursor, sql, params, source, started)
+
+
+def reprice_from_rows(rows, source='', batch_size=1000):
+    """
+    Set prices from (name, price) pairs, e.g. a supplier's price list.
+
+    Every ingredient with the name gets the price; for a repeated name the
+    last pair wins, unknown names are ignored.
+    """
+    started = time.monotonic()
+    prices = dict(rows)
+    ingredient = Ingredient._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {STAGING_TABLE} '
+            '(name varchar(255) NOT NULL PRIMARY KEY, price decimal(10, 2) NOT NULL)'
+        )
+        items = iter(prices.items())
+        while batch := list(islice(items, batch_size)):
+            cursor.executemany(
+                f'INSERT INTO {STAGING_TABLE} (name, price) VALUES (%s, %s)', batch
+            )
+        result = _apply(
+            cursor,
+            f'SELECT i.id, i.price, s.price FROM {ingredient} i '
+            f'JOIN {STAGING_TABLE} s ON s.name = i.name WHERE s.price <> i.price',
+            [], source, started,
+        )
+        # При ошибке таблицу уберёт откат транзакции
+        cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+    return result
@@ -0,0 +1,142 @@
+"""
+Read replicas for the catalog tables.
+
+ReplicaRouter sends reads of Recipe, Ingredient and RecipeIngredient to
+a random alias from settings.DATABASE_REPLICAS and every write to
+'default'. A replica lags behind the primary, so reads go to the primary
+when they must see fresh data: inside a transaction, after the current
+request or command has written anything, and for REPLICA_PIN_SECONDS
+after a client's write (ReplicaPinningMiddleware, signed cookie).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICATED_MODELS = {'recipe', 'ingredient', 'recipeingredient'}
+
+# Контекст запроса (или команды): читать только с primary, была ли запись,
+# было ли чтение с реплики
+_pinned = ContextVar('replica_pinned', default=False)
+_wrote = ContextVar('replica_wrote', default=False)
+_replica_used = ContextVar('replica_used', default=False)
+
+
+def pinned():
+    return _pinned.get()
+
+
+def replica_used():
+    """Whether the current request has read anything from a replica"""
+    return _replica_used.get()
+
+
+@contextmanager
+def use_primary():
+    """Read everything from the primary inside the block"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _replicated(model):
+    meta = model._meta
+    return meta.app_label == 'recipe_catalog' and meta.model_name in REPLICATED_MODELS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _replicated(model) or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        _replica_used.set(True)
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if _replicated(model):
+            # Дальше в этом запросе читаем свою запись с primary
+            _pinned.set(True)
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии primary: связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for a client across requests.
+
+    A request that wrote catalog data sets a signed cookie; for
+    REPLICA_PIN_SECONDS afterwards that client's requests read only from
+    the primary, until the replicas have caught up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = self.finish(tokens)
+        return self.pin(response, wrote)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = self.finish(tokens)
+        return self.pin(response, wrote)
+
+    def start(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE
+        # Просроченная или поддельная подпись даёт default
+        was_pinned = request.get_signed_cookie(
+            cookie, default=None, salt=cookie, max_age=settings.REPLICA_PIN_SECONDS
+        ) == '1'
+        return [
+            (_pinned, _pinned.set(was_pinned)),
+            (_wrote, _wrote.set(False)),
+            (_replica_used, _replica_used.set(False)),
+        ]
+
+    def finish(self, tokens):
+        """Restore the request's context, return whether it wrote"""
+        wrote = _wrote.get()
+        for var, token in tokens:
+            var.reset(token)
+        return wrote
+
+    def pin(self, response, wrote):
+        if wrote:
+            # Окно отсчитывается от последней записи
+            cookie = settings.REPLICA_PIN_COOKIE
+            response.set_signed_cookie(
+                cookie, '1', salt=cookie, max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
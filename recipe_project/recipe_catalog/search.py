@@ -0,0 +1,193 @@
+"""
+Full-text search over recipe title, description and ingredient names.
+
+SQLite keeps documents in an FTS5 virtual table ranked with bm25(),
+PostgreSQL in a table of weighted tsvectors under a GIN index (both
+created by migration 0007). The documents are written from the ORM (see
+signals.py), so the API below is the same on either backend.
+"""
+import re
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Recipe, RecipeIngredient
+
+FTS_TABLE = 'recipe_catalog_recipe_fts'
+# Маркеры подсветки: не встречаются в тексте и переживают escape()
+MARK_START, MARK_END = '\x02', '\x03'
+
+SearchResult = namedtuple('SearchResult', 'recipe rank snippet')
+
+
+class SqliteBackend:
+    def match_expression(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def delete(self, cursor, ids):
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(i,) for i in ids])
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, ingredients) '
+            'VALUES (%s, %s, %s, %s)',
+            documents,
+        )
+
+    def truncate(self, cursor):
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def matching_ids(self, expression):
+        return f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]
+
+    def search(self, cursor, expression, limit, offset):
+        # Заголовок весит больше ингредиентов, ингредиенты больше описания
+        cursor.execute(
+            f'SELECT rowid, -bm25({FTS_TABLE}, 10.0, 1.0, 5.0) AS rank, '
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 12) "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank DESC LIMIT %s OFFSET %s',
+            [MARK_START, MARK_END, expression, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+class PostgresBackend:
+    config = 'simple'
+
+    def match_expression(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def delete(self, cursor, ids):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE recipe_id = ANY(%s)', [list(ids)])
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (recipe_id, document) VALUES (%s, '
+            f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'C') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'B'))",
+            documents,
+        )
+
+    def truncate(self, cursor):
+        cursor.execute(f'TRUNCATE {FTS_TABLE}')
+
+    def matching_ids(self, expression):
+        return (
+            f'SELECT recipe_id FROM {FTS_TABLE} '
+            f"WHERE document @@ to_tsquery('{self.config}', %s)",
+            [expression],
+        )
+
+    def search(self, cursor, expression, limit, offset):
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=24, MinWords=8'
+        cursor.execute(
+            'SELECT f.recipe_id, ts_rank_cd(f.document, q) AS rank, '
+            f"ts_headline('{self.config}', r.title || ' ' || r.description, q, %s) "
+            f'FROM {FTS_TABLE} f '
+            'JOIN recipe_catalog_recipe r ON r.id = f.recipe_id, '
+            f"to_tsquery('{self.config}', %s) q "
+            'WHERE f.document @@ q ORDER BY rank DESC LIMIT %s OFFSET %s',
+            [options, expression, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SqliteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(vendor=None):
+    backend = BACKENDS.get(vendor or connection.vendor)
+    return backend() if backend else None
+
+
+def _documents(rows):
+    names = defaultdict(list)
+    links = RecipeIngredient.objects.filter(
+        recipe__in=[row[0] for row in rows]
+    ).values_list('recipe_id', 'ingredient__name')
+    for recipe_id, name in links:
+        names[recipe_id].append(name)
+    return [
+        (pk, title, description, ' '.join(names[pk]))
+        for pk, title, description in rows
+    ]
+
+
+def index_recipes(recipes, batch_size=1000):
+    """(Re)index the given Recipe queryset, batch_size recipes at a time"""
+    backend = get_backend()
+    if backend is None:
+        return
+    rows = recipes.order_by('pk').values_list('pk', 'title', 'description')
+    rows = rows.iterator(chunk_size=batch_size)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            documents = _documents(batch)
+            backend.delete(cursor, [document[0] for document in documents])
+            backend.insert(cursor, documents)
+
+
+def remove_recipes(ids):
+    backend = get_backend()
+    if backend is None or not ids:
+        return
+    with connection.cursor() as cursor:
+        backend.delete(cursor, ids)
+
+
+def clear_index():
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.truncate(cursor)
+
+
+def highlight(snippet):
+    """Escape a backend snippet and turn match markers into <mark> tags"""
+    html = escape(snippet or '')
+    return mark_safe(html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def filter_recipes(queryset, query):
+    """Recipes of the queryset matching the query, in the queryset's order"""
+    tokens = re.findall(r'\w+', query.lower())
+    backend = get_backend()
+    if not tokens:
+        return queryset
+    if backend is None:
+        return queryset.filter(title__icontains=' '.join(tokens))
+    sql, params = backend.matching_ids(backend.match_expression(tokens))
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+def search_recipes(query, limit=20, offset=0):
+    """Return SearchResult list ranked by relevance, best first"""
+    tokens = re.findall(r'\w+', query.lower())
+    backend = get_backend()
+    if not tokens:
+        return []
+    if backend is None:
+        # Прочие СУБД: без индекса, только по заголовку
+        recipes = Recipe.objects.filter(title__icontains=' '.join(tokens))
+        return [
+            SearchResult(recipe, 0, recipe.title)
+            for recipe in recipes.order_by('title', 'id')[offset:offset + limit]
+        ]
+    with connection.cursor() as cursor:
+        rows = backend.search(cursor, backend.match_expression(tokens), limit, offset)
+    recipes = Recipe.objects.in_bulk([row[0] for row in rows])
+    return [
+        SearchResult(recipes[pk], rank, highlight(snippet))
+        for pk, rank, snippet in rows
+        if pk in recipes
+    ]
@@ -0,0 +1,158 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import auth, cache, images, pantry, search, sqlite
+from .models import Ingredient, Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_pages(recipe_ids):
+    """Drop cached pages of the recipes and the recipe list after commit"""
+    names = [cache.RECIPE_LIST] + [cache.recipe_key(pk) for pk in recipe_ids]
+    transaction.on_commit(lambda: cache.bump_versions(names))
+
+
+def invalidate_all_pages():
+    """Drop cached pages of every recipe and the recipe list after commit"""
+    names = [cache.RECIPE_LIST, cache.ALL_RECIPES]
+    transaction.on_commit(lambda: cache.bump_versions(names))
+
+
+def release_image(name, storage):
+    """Delete an image and its variants once no recipe references it"""
+    if not name or Recipe.objects.filter(image=name).exists():
+        return
+    storage.delete(name)
+    images.delete_variants(name, storage)
+
+
+def release_image_on_commit(name, storage):
+    transaction.on_commit(lambda: release_image(name, storage))
+
+
+def recipes_changed(recipes, reindex=True):
+    """
+    Bring everything derived from recipe contents up to date in bulk and
+    return how many recipes changed; reindex=False skips the search
+    documents when no text has changed.
+    """
+    changed = recipes.update_totals()
+    if reindex:
+        search.index_recipes(recipes)
+    if changed > settings.VIEW_CACHE_BULK_INVALIDATION:
+        invalidate_all_pages()
+    else:
+        invalidate_pages(recipes.values_list('pk', flat=True))
+    # update_totals сдвинул updated_at: индекс кладовой подхватит рецепты сам
+    transaction.on_commit(pantry.index.expire)
+    return changed
+
+
+def ingredients_changed(ingredients, reindex=True):
+    """Refresh recipes that use any of the given ingredients"""
+    return recipes_changed(Recipe.objects.filter(
+        pk__in=RecipeIngredient.objects.filter(
+            ingredient__in=ingredients
+        ).values('recipe')
+    ), reindex=reindex)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    search.index_recipes(Recipe.objects.filter(pk=instance.pk))
+    invalidate_pages([instance.pk])
+    image = instance.image
+    old_name = getattr(instance, '_loaded_image', None)
+    if old_name and old_name != image.name:
+        release_image_on_commit(old_name, image.storage)
+    instance._loaded_image = image.name
+    if image and not images.has_variants(image.name, image.storage):
+        try:
+            images.generate_variants(image.name, image.storage)
+        except (OSError, ValueError):
+            # Битый файл не должен ломать сохранение рецепта
+            logger.exception('Could not generate variants for %s', image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    search.remove_recipes([instance.pk])
+    invalidate_pages([instance.pk])
+    # После delete() у instance уже нет pk
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry.index.forget([recipe_id]))
+    if instance.image:
+        release_image_on_commit(instance.image.name, instance.image.storage)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    # Каскадные удаления обрабатываются одним запросом у источника
+    if isinstance(origin, (Recipe, Ingredient)):
+        return
+    recipes_changed(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = getattr(instance, '_cleared_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+    recipes_changed(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if created or not instance.recipe_fields_changed():
+        return
+    ingredients_changed([instance.pk])
+    instance._loaded_values = {
+        name: getattr(instance, name) for name in Ingredient.RECIPE_FIELDS
+    }
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    instance._affected_recipe_ids = list(
+        instance.recipeingredient_set.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(pk__in=instance._affected_recipe_ids))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    # Закешированный CachedModelBackend пользователь устарел
+    auth.forget_user(instance.pk)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    sqlite.apply_pragmas(connection)
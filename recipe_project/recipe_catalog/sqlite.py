@@ -0,0 +1,81 @@
+"""
+Production tuning and maintenance of the SQLite database.
+
+Pragmas from settings.SQLITE_PRAGMAS are applied to every new connection
+(connection_created); journal_mode=WAL (SQLITE_WAL) lets readers work while
+a writer commits. backup() copies a live database page by page through the SQLite
+backup API, optimize() refreshes planner statistics.
+"""
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db.transaction import TransactionManagementError
+
+
+def apply_pragmas(connection):
+    """Run SQLITE_PRAGMAS on a freshly opened sqlite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    # Сырой sqlite3-курсор: служебные запросы не попадают в журнал и статистику
+    for name, value in settings.SQLITE_PRAGMAS:
+        # Режим журнала пишется в файл: у read-only копии его не поменять
+        if read_only and name == 'journal_mode':
+            continue
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def pragmas(connection, names=('journal_mode', 'synchronous', 'busy_timeout',
+                               'cache_size', 'mmap_size', 'temp_store')):
+    """{name: current value} of the given pragmas"""
+    connection.ensure_connection()
+    values = {}
+    for name in names:
+        # mmap_size у базы в памяти не возвращает строки
+        row = connection.connection.execute(f'PRAGMA {name}').fetchone()
+        values[name] = row[0] if row else None
+    return values
+
+
+def backup(connection, target, pages=1024, sleep=0.005, progress=None):
+    """
+    Copy the live database to the target file without blocking writers.
+
+    The backup API copies `pages` pages per step and releases the read lock
+    between steps, so writers are never blocked for long; a write from another
+    connection restarts the copy. The copy goes to a temporary file that is
+    renamed over target only when complete. progress(remaining, total) is
+    called after every step.
+    """
+    # С открытой пишущей транзакцией шаг копирования вечно получает SQLITE_LOCKED
+    if connection.in_atomic_block:
+        raise TransactionManagementError('Backup cannot run inside a transaction')
+    connection.ensure_connection()
+    partial = f'{target}.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.monotonic()
+    destination = sqlite3.connect(partial)
+    try:
+        connection.connection.backup(
+            destination, pages=pages, sleep=sleep,
+            progress=progress and (
+                lambda status, remaining, total: progress(remaining, total)
+            ),
+        )
+        # Копия самодостаточна: без -wal файла рядом
+        destination.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        destination.close()
+    os.replace(partial, target)
+    return time.monotonic() - started
+
+
+def optimize(connection, analyze=False):
+    """PRAGMA optimize, or a full ANALYZE of every table and index"""
+    connection.ensure_connection()
+    started = time.monotonic()
+    connection.connection.execute('ANALYZE' if analyze else 'PRAGMA optimize')
+    return time.monotonic() - started
@@ -0,0 +1,28 @@
+/* Ленивая подгрузка вариантов для AutocompleteSelectMultiple */
+(function ($) {
+    $(function () {
+        $('select[data-autocomplete-url]').each(function () {
+            var $select = $(this);
+            // Сервер листает курсорами: запоминаем курсор следующей страницы
+            var cursors = {};
+            $select.select2({
+                width: '100%',
+                ajax: {
+                    url: $select.data('autocomplete-url'),
+                    delay: 250,
+                    data: function (params) {
+                        var term = params.term || '';
+                        var page = params.page || 1;
+                        return {q: term, next: cursors[term + '\n' + page] || ''};
+                    },
+                    processResults: function (data, params) {
+                        var term = params.term || '';
+                        var page = params.page || 1;
+                        cursors[term + '\n' + (page + 1)] = data.next;
+                        return {results: data.results, pagination: data.pagination};
+                    }
+                }
+            });
+        });
+    });
+})(jQuery);
@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Имя файла = sha256 содержимого: по нему же nginx и media() узнают,
+# что файл никогда не изменится
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{64}(\.|$)')
+
+
+# styles.3f2a9c1b7e04.css — имя из манифеста ManifestStaticFilesStorage
+STATIC_HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico',
+}
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def is_static_hashed(name):
+    return bool(STATIC_HASHED_NAME_RE.search(name))
+
+
+def compressors():
+    """[(suffix, Content-Encoding, compress)] available in this environment"""
+    available = [('.gz', 'gzip', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        available.insert(0, ('.br', 'br', lambda data: brotli.compress(data, quality=11)))
+    return available
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores uploads as <upload dir>/<h[:2]>/<sha256>.<ext>.
+
+    Identical bytes map to the same name and are written only once; the
+    rows that point at a file are its reference count (see
+    signals.release_image), so delete() itself stays a plain unlink.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def save_exact(self, name, content):
+        """Write derived files (image variants) under the given name"""
+        if self.exists(name):
+            self.delete(name)
+        return super().save(name, content)
+
+
+def recipe_image_storage():
+    return ContentAddressedStorage()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes name.gz (and name.br when
+    the brotli package is installed) next to every text file it collects.
+
+    Compression runs once, in collectstatic; nginx (gzip_static) and
+    StaticFilesMiddleware only pick the variant the client accepts. A
+    variant that is not smaller than the original is not kept.
+
+    Until collectstatic has written the manifest, url() returns unhashed
+    names as with DEBUG, so DEBUG=False runs (bench, tests) work without it.
+    """
+
+    def url(self, name, force=False):
+        if not self.hashed_files and not force:
+            return FileSystemStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        collected = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                collected.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(collected - {None}):
+                self.compress(name)
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        for suffix, _, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
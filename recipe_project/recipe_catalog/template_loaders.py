@@ -0,0 +1,62 @@
+"""
+Template loader that strips indentation and blank lines from HTML templates.
+
+It wraps other loaders and rewrites a template's source before it is
+compiled, so behind the cached loader this happens once per template and
+rendering costs nothing extra. Every whitespace run containing a line break
+becomes a single line break: browsers treat any run of whitespace as one
+space, so pages look the same. <pre> and <textarea> blocks are left alone.
+"""
+import os
+import re
+
+from django.template import Origin
+from django.template.loaders.base import Loader as BaseLoader
+
+MINIFIED_EXTENSIONS = ('.html', '.htm')
+
+_PRESERVED = re.compile(r'<(pre|textarea)\b.*?</\1\s*>', re.S | re.I)
+_LINE_BREAKS = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+
+def collapse_whitespace(source):
+    parts, position = [], 0
+    for match in _PRESERVED.finditer(source):
+        parts.append(_LINE_BREAKS.sub('\n', source[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_LINE_BREAKS.sub('\n', source[position:]))
+    return ''.join(parts)
+
+
+class Loader(BaseLoader):
+    """('recipe_catalog.template_loaders.Loader', [loaders...])"""
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_dirs(self):
+        # Каталоги для автоперезагрузки шаблонов в runserver
+        for loader in self.loaders:
+            if hasattr(loader, 'get_dirs'):
+                yield from loader.get_dirs()
+
+    def get_template_sources(self, template_name):
+        # Кешируя, cached.Loader читает файл через origin.loader: им должен быть этот
+        for loader in self.loaders:
+            for source in loader.get_template_sources(template_name):
+                origin = Origin(source.name, source.template_name, loader=self)
+                origin.source = source
+                yield origin
+
+    def get_contents(self, origin):
+        contents = origin.source.loader.get_contents(origin.source)
+        if os.path.splitext(origin.name)[1].lower() in MINIFIED_EXTENSIONS:
+            contents = collapse_whitespace(contents)
+        return contents
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
@@ -0,0 +1,47 @@
+from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from recipe_catalog.images import (
+    FORMATS, has_variants, placeholder_data_uri, variant_name
+)
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', width=None, css_class='w3-image'):
+    """<picture> with WebP/JPEG srcset, lazy loading and a blurred placeholder"""
+    if not image:
+        return ''
+    name, storage = image.name, image.storage
+    attrs = {'alt': alt, 'class': css_class, 'loading': 'lazy', 'decoding': 'async'}
+    if width:
+        attrs['width'] = width
+    if not has_variants(name, storage):
+        # Варианты ещё не сгенерированы (см. generate_image_variants)
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    def srcset(extension):
+        return ', '.join(
+            f'{storage.url(variant_name(name, w, extension))} {w}w'
+            for w in settings.IMAGE_VARIANT_WIDTHS
+        )
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(extension), sizes) for extension, _, mime in FORMATS[:-1]),
+    )
+    fallback = FORMATS[-1][0]
+    middle = settings.IMAGE_VARIANT_WIDTHS[len(settings.IMAGE_VARIANT_WIDTHS) // 2]
+    attrs.update({
+        'srcset': srcset(fallback),
+        'sizes': sizes,
+        'style': f'background: url({placeholder_data_uri(name, storage)}) '
+                 'center / cover no-repeat',
+    })
+    return format_html(
+        '<picture>{}<img src="{}"{}></picture>',
+        sources, storage.url(variant_name(name, middle, fallback)), flatatt(attrs),
+    )
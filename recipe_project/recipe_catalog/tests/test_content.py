@@ -1,7 +1,18 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from PIL import Image
+from recipe_catalog import images, pantry, search
 from recipe_catalog.models import Recipe, Ingredient, RecipeIngredient
+from recipe_catalog.template_loaders import collapse_whitespace
 from datetime import timedelta
 from decimal import Decimal
 
@@ -159,4 +170,377 @@ class ContentTestCase(TestCase):
         self.client.force_login(self.user)
         response = self.client.get(create_url)
         self.assertEqual(response.status_code, 200)
-        
\ No newline at end of file
+        
+
+class CursorPaginationTestCase(TestCase):
+    INDEX_URL = reverse('recipe_catalog:index')
+
+    @classmethod
+    def setUpTestData(cls):
+        # Одинаковые названия проверяют разбор ничьей по id
+        Recipe.objects.bulk_create(
+            Recipe(title=f'Recipe {i % 8:02d}', description=f'Description {i}')
+            for i in range(23)
+        )
+        cls.expected = list(
+            Recipe.objects.order_by('title', 'id').values_list('id', flat=True)
+        )
+
+    def test_cursor_pages_cover_all_recipes_in_order(self):
+        """Test following next cursors visits every recipe exactly once"""
+        seen, cursor = [], None
+        while True:
+            url = self.INDEX_URL + (f'?cursor={cursor}' if cursor else '')
+            page = self.client.get(url).context['recipes']
+            seen.extend(recipe.id for recipe in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Test previous cursor leads back to the same recipes"""
+        first = self.client.get(self.INDEX_URL).context['recipes']
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            f'{self.INDEX_URL}?cursor={first.next_cursor}'
+        ).context['recipes']
+        back = self.client.get(
+            f'{self.INDEX_URL}?cursor={second.previous_cursor}'
+        ).context['recipes']
+        self.assertEqual([r.id for r in back], [r.id for r in first])
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Test keyset page is a single query without COUNT(*)"""
+        with self.assertNumQueries(1) as ctx:
+            self.client.get(self.INDEX_URL)
+        self.assertNotIn('COUNT(', ctx.captured_queries[0]['sql'])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Test garbage cursor shows the first page"""
+        response = self.client.get(f'{self.INDEX_URL}?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe.id for recipe in response.context['recipes']]
+        self.assertEqual(ids, self.expected[:10])
+
+
+class SearchTestCase(TestCase):
+    SEARCH_URL = reverse('recipe_catalog:search')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beet = Ingredient.objects.create(
+            name='Свёкла', weight=300, weight_ready=250, price=Decimal('40.00')
+        )
+        cls.borsch = Recipe.objects.create(
+            title='Борщ', description='Суп <b>красный</b> со сметаной'
+        )
+        cls.borsch.ingredients.set([cls.beet])
+        cls.salad = Recipe.objects.create(
+            title='Винегрет', description='Салат, где есть борщевая свёкла'
+        )
+
+    def search(self, query):
+        response = self.client.get(self.SEARCH_URL, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.context['results']
+
+    def test_title_match_ranks_first(self):
+        """Test a title hit outranks a description hit"""
+        results = self.search('борщ')
+        self.assertEqual([r.recipe for r in results], [self.borsch, self.salad])
+
+    def test_search_by_ingredient_name(self):
+        results = self.search('свёкла')
+        self.assertEqual({r.recipe for r in results}, {self.borsch, self.salad})
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        snippet = self.search('красный')[0].snippet
+        self.assertIn('<mark>красный</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_index_follows_changes(self):
+        """Test title edits, ingredient renames and deletions reach the index"""
+        self.salad.title = 'Оливье'
+        self.salad.save()
+        self.assertEqual([r.recipe for r in self.search('оливье')], [self.salad])
+        self.beet.name = 'Бурак'
+        self.beet.save()
+        self.assertEqual([r.recipe for r in self.search('бурак')], [self.borsch])
+        self.borsch.delete()
+        self.assertEqual(self.search('бурак'), [])
+
+    def test_rebuild_command(self):
+        search.clear_index()
+        self.assertEqual(self.search('борщ'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('борщ')), 2)
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('" OR NEAR( *'), [])
+
+
+class ImageVariantsTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, size=(1600, 900)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+    def test_variants_generated_on_upload(self):
+        recipe = Recipe.objects.create(title='Carrot cake', description='Cake', image=self.upload())
+        storage = recipe.image.storage
+        for name in images.variant_names(recipe.image.name):
+            self.assertTrue(storage.exists(name), name)
+        with storage.open(images.variant_name(recipe.image.name, 640, 'webp')) as variant:
+            self.assertEqual(Image.open(variant).size, (640, 360))
+        # Маленький оригинал не растягивается
+        small = Recipe.objects.create(title='Tart', description='Tart', image=self.upload((200, 100)))
+        with storage.open(images.variant_name(small.image.name, 1024, 'jpg')) as variant:
+            self.assertEqual(Image.open(variant).size, (200, 100))
+
+    def test_detail_page_uses_srcset(self):
+        recipe = Recipe.objects.create(title='Carrot cake', description='Cake', image=self.upload())
+        response = self.client.get(reverse('recipe_catalog:recipe_detail', args=[recipe.pk]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.320w.webp 320w')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'data:image/jpeg;base64,')
+
+    def test_backfill_command(self):
+        recipe = Recipe.objects.create(title='Carrot cake', description='Cake', image=self.upload())
+        images.delete_variants(recipe.image.name)
+        response = self.client.get(reverse('recipe_catalog:recipe_detail', args=[recipe.pk]))
+        self.assertContains(response, f'src="{recipe.image.url}"')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_image_variants', stdout=StringIO())
+        self.assertTrue(images.has_variants(recipe.image.name))
+        # Прежний ETag больше не подходит: страница приходит уже с srcset
+        response = self.client.get(
+            reverse('recipe_catalog:recipe_detail', args=[recipe.pk]),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertContains(response, '.320w.webp 320w')
+
+
+class ContentAddressedMediaTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name='cat.jpg', color='gray'):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), color).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+    def test_identical_uploads_share_one_file(self):
+        first = Recipe.objects.create(title='A', description='A', image=self.upload('cat.jpg'))
+        second = Recipe.objects.create(title='B', description='B', image=self.upload('Cat.JPG'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^recipe_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+    def test_file_removed_with_last_reference(self):
+        first = Recipe.objects.create(title='A', description='A', image=self.upload())
+        second = Recipe.objects.create(title='B', description='B', image=self.upload())
+        storage = first.image.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = self.upload(color='white')
+            second.save()
+        self.assertFalse(storage.exists(first.image.name))
+        self.assertFalse(images.has_variants(first.image.name))
+
+    def test_media_view_cache_headers_and_accel_redirect(self):
+        recipe = Recipe.objects.create(title='A', description='A', image=self.upload())
+        response = self.client.get(recipe.image.url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with override_settings(MEDIA_ACCEL_REDIRECT=True):
+            response = self.client.get(recipe.image.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{recipe.image.name}'
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+
+    def test_media_view_rejects_traversal(self):
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, 404)
+
+    def test_dedupe_command(self):
+        recipe = Recipe.objects.create(title='A', description='A')
+        other = Recipe.objects.create(title='B', description='B')
+        legacy = FileSystemStorage()
+        for obj, name in ((recipe, 'cat.jpg'), (other, 'cat_3hzFu4u.jpg')):
+            saved = legacy.save(f'recipe_images/{name}', self.upload())
+            Recipe.objects.filter(pk=obj.pk).update(image=saved)
+        call_command('dedupe_media', stdout=StringIO())
+        recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(recipe.image.name, other.image.name)
+        self.assertFalse(legacy.exists('recipe_images/cat.jpg'))
+        self.assertFalse(legacy.exists('recipe_images/cat_3hzFu4u.jpg'))
+        self.assertTrue(images.has_variants(recipe.image.name))
+
+
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='testpass')
+        cls.milk = Ingredient.objects.create(
+            name='Milk', weight=200, weight_ready=200, price=Decimal('1.20')
+        )
+        cls.oats = Ingredient.objects.create(
+            name='Oats', weight=50, weight_ready=150, price=Decimal('0.30')
+        )
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                title=f'Porridge {number}', description='Breakfast', author=cls.user
+            )
+            recipe.ingredients.set([cls.milk, cls.oats])
+
+    def export(self, kind, export_format):
+        url = reverse('recipe_catalog:export', args=[kind, export_format])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_requires_login(self):
+        response = self.client.get(reverse('recipe_catalog:export', args=['recipes', 'csv']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_recipes_ndjson(self):
+        self.client.force_login(self.user)
+        rows = [json.loads(line) for line in self.export('recipes', 'ndjson').splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['title'], 'Porridge 0')
+        self.assertEqual(rows[0]['author'], 'exporter')
+        self.assertEqual(rows[0]['total_price'], '1.50')
+        self.assertEqual(rows[0]['ingredients'], ['Milk', 'Oats'])
+
+    def test_csv_is_importable(self):
+        self.client.force_login(self.user)
+        rows = list(csv.DictReader(self.export('recipes', 'csv').splitlines()))
+        self.assertEqual(rows[4]['ingredients'], 'Milk;Oats')
+        rows = list(csv.DictReader(self.export('ingredients', 'csv').splitlines()))
+        self.assertEqual(rows[1], {
+            'id': str(self.oats.pk), 'name': 'Oats', 'weight': '50',
+            'weight_ready': '150', 'price': '0.30',
+        })
+        self.assertEqual(self.client.get('/export/users.csv').status_code, 404)
+
+    def test_query_count_depends_on_chunks_not_rows(self):
+        """Test one recipe query plus one prefetch per chunk of 2 rows"""
+        stdout = StringIO()
+        with self.assertNumQueries(1 + 3):
+            call_command('export_catalog', 'recipes', chunk_size=2, stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 6)
+
+
+@override_settings(PANTRY_SYNC_SECONDS=0)
+class PantryTestCase(TestCase):
+    PANTRY_URL = reverse('recipe_catalog:pantry')
+
+    @classmethod
+    def setUpTestData(cls):
+        def ingredient(name):
+            return Ingredient.objects.create(
+                name=name, weight=100, weight_ready=100, price=Decimal('10.00')
+            )
+
+        cls.egg, cls.milk, cls.flour, cls.sugar = map(
+            ingredient, ('Egg', 'Milk', 'Flour', 'Sugar')
+        )
+        cls.omelette = Recipe.objects.create(title='Omelette', description='-')
+        cls.omelette.ingredients.set([cls.egg, cls.milk])
+        cls.pancakes = Recipe.objects.create(title='Pancakes', description='-')
+        cls.pancakes.ingredients.set([cls.egg, cls.milk, cls.flour])
+        cls.boiled = Recipe.objects.create(title='Boiled egg', description='-')
+        cls.boiled.ingredients.set([cls.egg])
+        cls.cake = Recipe.objects.create(title='Cake', description='-')
+        cls.cake.ingredients.set([cls.flour, cls.sugar])
+
+    def setUp(self):
+        self.index = pantry.PantryIndex()
+
+    def search(self, have, missing=0):
+        matches, total = self.index.search([item.pk for item in have], missing, 10)
+        return [(match.recipe_id, match.missing, match.present) for match in matches], total
+
+    def test_ranked_by_missing_then_coverage(self):
+        self.assertEqual(self.search([self.egg, self.milk]), (
+            [(self.omelette.pk, 0, 2), (self.boiled.pk, 0, 1)], 2
+        ))
+        matches, total = self.search([self.egg, self.milk], missing=1)
+        self.assertEqual([match[0] for match in matches], [
+            self.omelette.pk, self.boiled.pk, self.pancakes.pk
+        ])
+        self.assertEqual(total, 3)
+        self.assertEqual(self.search([self.sugar], missing=1)[0], [(self.cake.pk, 1, 1)])
+
+    def test_index_follows_changes(self):
+        """Test added links, deleted recipes and a rebuild reach the index"""
+        self.search([self.egg])
+        self.boiled.ingredients.add(self.sugar)
+        self.assertEqual(self.search([self.egg, self.sugar])[0], [(self.boiled.pk, 0, 2)])
+        boiled_id = self.boiled.pk
+        self.boiled.delete()
+        self.index.forget([boiled_id])
+        self.assertEqual(self.search([self.egg, self.sugar])[0], [])
+        with override_settings(PANTRY_OVERLAY_LIMIT=0):
+            self.cake.ingredients.remove(self.sugar)
+            self.assertEqual(self.search([self.flour])[0], [(self.cake.pk, 0, 1)])
+        self.assertEqual(self.index._state[1], {})
+
+    def test_deletion_in_another_process_reaches_the_index(self):
+        self.assertEqual(self.search([self.egg])[1], 1)
+        # Удаление без forget(): этот индекс о нём не знает, как индекс другого воркера
+        Recipe.objects.filter(pk=self.boiled.pk).delete()
+        self.assertEqual(self.search([self.egg]), ([], 0))
+        self.assertEqual(self.search([self.egg, self.milk])[0], [(self.omelette.pk, 0, 2)])
+
+    def test_page_lists_missing_ingredients(self):
+        pantry.index.reset()
+        response = self.client.get(self.PANTRY_URL, {
+            'ingredients': [self.egg.pk, self.milk.pk], 'missing': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.context['results']
+        self.assertEqual(
+            [(result['recipe'], result['lacking']) for result in results],
+            [(self.omelette, []), (self.boiled, []), (self.pancakes, ['Flour'])],
+        )
+        self.assertContains(response, 'Не хватает: Flour')
+        response = self.client.get(self.PANTRY_URL, {
+            'ingredients': [self.egg.pk], 'missing': 99,
+        })
+        self.assertEqual(response.context['results'], [])
+        self.assertTrue(response.context['form'].errors)
+
+
+class TemplateMinifyTestCase(SimpleTestCase):
+    def test_collapse_whitespace(self):
+        source = (
+            '<ul>\n    <li>{{ a }}</li>\n\n    <li>b</li>   \n</ul>\n'
+            '<pre>\n  keep\n    this</pre>\n  <textarea>\n  and this\n</textarea>'
+        )
+        self.assertEqual(collapse_whitespace(source), (
+            '<ul>\n<li>{{ a }}</li>\n<li>b</li>\n</ul>\n'
+            '<pre>\n  keep\n    this</pre>\n<textarea>\n  and this\n</textarea>'
+        ))
+
+    def test_pages_are_rendered_without_indentation(self):
+        html = self.client.get(reverse('recipe_catalog:about')).content.decode()
+        self.assertIn('<html lang="ru">\n<head>\n<meta charset="utf-8">', html)
+        self.assertNotRegex(html, r'\n[ \t]')
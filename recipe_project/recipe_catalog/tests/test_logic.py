@@ -1,7 +1,30 @@
+import json
+import os
+import sqlite3
+import tempfile
+from contextvars import Context
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from io import StringIO
+from unittest import mock
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
-from recipe_catalog.models import Recipe, Ingredient, RecipeIngredient
+from django.template import engines
+from recipe_catalog import pricing, routers, sqlite as sqlite_tools, urls as catalog_urls, warmup
+from recipe_catalog.auth import user_key
+from recipe_catalog.cache import ALL_RECIPES, cache_stats, get_cache, get_versions
+from recipe_catalog.management.commands.bench import Command as BenchCommand
+from recipe_catalog.models import PriceHistory, Recipe, Ingredient, RecipeIngredient
+from recipe_catalog.search import FTS_TABLE, search_recipes
+from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
@@ -201,4 +224,666 @@ class TestRecipeCreation(TestCase):
         # Verify recipe was created
         new_recipe = Recipe.objects.filter(title='New Recipe').first()
         self.assertIsNotNone(new_recipe)
-        self.assertEqual(new_recipe.description, 'Test Description')
\ No newline at end of file
+        self.assertEqual(new_recipe.description, 'Test Description')
+
+class TestRecipeTotals(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour = Ingredient.objects.create(
+            name='Flour', weight=1000, weight_ready=900, price=Decimal('2.50')
+        )
+        cls.sugar = Ingredient.objects.create(
+            name='Sugar', weight=500, weight_ready=500, price=Decimal('1.50')
+        )
+        cls.recipe = Recipe.objects.create(title='Cake', description='Cake')
+        cls.recipe.ingredients.set([cls.flour, cls.sugar])
+
+    def assertTotals(self, price, weight, weight_ready, count):
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.total_price, Decimal(price))
+        self.assertEqual(self.recipe.total_weight, weight)
+        self.assertEqual(self.recipe.total_weight_ready, weight_ready)
+        self.assertEqual(self.recipe.ingredients_count, count)
+
+    def test_totals_after_set(self):
+        self.assertTotals('4.00', 1500, 1400, 2)
+
+    def test_totals_after_link_removed(self):
+        self.recipe.ingredients.remove(self.sugar)
+        self.assertTotals('2.50', 1000, 900, 1)
+        RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+        self.assertTotals('0', 0, 0, 0)
+
+    def test_totals_after_ingredient_price_change(self):
+        self.flour.price = Decimal('3.00')
+        self.flour.save()
+        self.assertTotals('4.50', 1500, 1400, 2)
+
+    def test_unchanged_ingredient_save_skips_update(self):
+        ingredient = Ingredient.objects.get(pk=self.flour.pk)
+        with self.assertNumQueries(1):
+            ingredient.save()
+
+    def test_totals_after_ingredient_deleted(self):
+        self.sugar.delete()
+        self.assertTotals('2.50', 1000, 900, 1)
+
+    def test_reverse_clear(self):
+        self.sugar.recipe_set.clear()
+        self.assertTotals('2.50', 1000, 900, 1)
+
+    def test_rebuild_command(self):
+        Recipe.objects.update(total_price=0, total_weight=0, ingredients_count=0)
+        call_command('rebuild_recipe_totals', batch_size=1, stdout=StringIO())
+        self.assertTotals('4.00', 1500, 1400, 2)
+
+    def test_rebuild_touches_only_stale_recipes(self):
+        # Сумма во float (2.14 + 3.21) не считается расхождением
+        for ingredient, price in ((self.flour, '2.14'), (self.sugar, '3.21')):
+            ingredient.price = Decimal(price)
+            ingredient.save()
+        fresh = Recipe.objects.create(title='Bread', description='Bread')
+        fresh.ingredients.set([self.flour])
+        Recipe.objects.filter(pk=self.recipe.pk).update(ingredients_count=0)
+        stamps = dict(Recipe.objects.values_list('pk', 'updated_at'))
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            call_command('rebuild_recipe_totals', stdout=out)
+        self.assertIn('1 recipes updated', out.getvalue())
+        self.assertTrue(callbacks)
+        self.assertTotals('5.35', 1500, 1400, 2)
+        self.assertEqual(Recipe.objects.get(pk=fresh.pk).updated_at, stamps[fresh.pk])
+        self.assertNotEqual(self.recipe.updated_at, stamps[self.recipe.pk])
+
+    def test_index_orders_by_price(self):
+        cheap = Recipe.objects.create(title='Zucchini', description='Cheap')
+        cheap.ingredients.set([self.sugar])
+        response = self.client.get(reverse('recipe_catalog:index'), {'order': 'price'})
+        titles = [recipe.title for recipe in response.context['recipes']]
+        self.assertEqual(titles, ['Zucchini', 'Cake'])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'views': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-views',
+    },
+    'sessions': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class TestPageCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cacheuser', password='testpass')
+        cls.egg = Ingredient.objects.create(
+            name='Egg', weight=50, weight_ready=45, price=Decimal('10.00')
+        )
+        cls.recipe = Recipe.objects.create(title='Omelette', description='Eggs')
+        cls.other = Recipe.objects.create(title='Toast', description='Bread')
+        cls.recipe.ingredients.set([cls.egg])
+        cls.detail_url = reverse('recipe_catalog:recipe_detail', args=[cls.recipe.pk])
+        cls.other_url = reverse('recipe_catalog:recipe_detail', args=[cls.other.pk])
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, 'Omelette')
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_auth_state_and_page_are_separate_entries(self):
+        index_url = reverse('recipe_catalog:index')
+        self.client.get(index_url)
+        self.assertEqual(self.client.get(index_url, {'order': 'price'})['X-Cache'], 'MISS')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(index_url)['X-Cache'], 'MISS')
+
+    def test_ingredient_change_invalidates_only_its_recipes(self):
+        self.client.get(self.detail_url)
+        self.client.get(self.other_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.egg.price = Decimal('12.00')
+            self.egg.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, '12.00')
+        self.assertEqual(self.client.get(self.other_url)['X-Cache'], 'HIT')
+
+    def test_recipe_edit_and_delete_invalidate_list(self):
+        index_url = reverse('recipe_catalog:index')
+        self.client.get(index_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = 'French toast'
+            self.other.save()
+        self.assertContains(self.client.get(index_url), 'French toast')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertNotContains(self.client.get(index_url), 'French toast')
+
+    @override_settings(VIEW_CACHE_BULK_INVALIDATION=0)
+    def test_bulk_change_invalidates_every_recipe_at_once(self):
+        self.client.get(self.detail_url)
+        self.client.get(self.other_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.egg.price = Decimal('12.00')
+            self.egg.save()
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.other_url)['X-Cache'], 'MISS')
+
+    def test_link_removal_invalidates_recipe(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.ingredients.remove(self.egg)
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'views': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-views',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-sessions',
+    },
+}, SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class TestCachedAuth(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='secret-pass-1')
+        cls.recipe = Recipe.objects.create(title='Omelette', description='Eggs')
+        cls.url = reverse('recipe_catalog:recipe_detail', args=[cls.recipe.pk])
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.login(username='reader', password='secret-pass-1')
+
+    def test_cached_page_for_logged_in_reader_needs_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+
+    def test_saved_user_is_reloaded(self):
+        edit_url = reverse('recipe_catalog:ingredients_bulk_edit')
+        self.assertEqual(self.client.get(edit_url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertRedirects(
+            self.client.get(edit_url), f'{settings.LOGIN_URL}?next={edit_url}',
+            fetch_redirect_response=False,
+        )
+
+    def test_users_are_not_cached_by_default(self):
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=0):
+            self.client.get(self.url)
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url)
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertIsNone(caches['sessions'].get(user_key(self.user.pk)))
+
+    def test_sessions_of_model_backend_stay_logged_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertTrue(self.client.get(self.url).wsgi_request.user.is_authenticated)
+
+
+class TestImportCatalog(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='importer', password='testpass')
+        cls.salt = Ingredient.objects.create(
+            name='Salt', weight=10, weight_ready=10, price=Decimal('1.00')
+        )
+        cls.soup = Recipe.objects.create(title='Soup', description='Salty')
+        cls.soup.ingredients.set([cls.salt])
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def run_import(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_catalog', chunk_size=2, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_ingredients_are_upserted_by_name(self):
+        path = self.write('ingredients.csv', (
+            'name,weight,weight_ready,price\n'
+            'Salt,10,10,2.00\n'
+            'Pepper,5,5,3.50\n'
+            'Broken,abc,1,1\n'
+        ))
+        _, stderr = self.run_import(ingredients=path)
+        self.assertIn('row 3', stderr)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 1)
+        self.assertTrue(Ingredient.objects.filter(name='Pepper', price='3.50').exists())
+        self.assertFalse(Ingredient.objects.filter(name='Broken').exists())
+        # Итоги рецептов с изменённым ингредиентом пересчитаны
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.total_price, Decimal('2.00'))
+
+    def test_recipes_with_links_are_indexed(self):
+        path = self.write('recipes.jsonl', (
+            '{"title": "Brine", "description": "Water and salt", '
+            '"cooking_time": "00:10:00", "author": "importer", "ingredients": ["Salt"]}\n'
+            '\n'
+            '{"title": "Ghost", "description": "?", "ingredients": ["Unknown"]}\n'
+            'not json\n'
+        ))
+        stdout, stderr = self.run_import(recipes=path)
+        self.assertIn('1 created, 0 updated, 2 skipped', stdout)
+        self.assertIn('unknown ingredients: Unknown', stderr)
+        brine = Recipe.objects.get(title='Brine')
+        self.assertEqual(brine.author, self.user)
+        self.assertEqual(brine.cooking_time, timedelta(minutes=10))
+        self.assertEqual(brine.total_price, Decimal('1.00'))
+        self.assertEqual(brine.ingredients_count, 1)
+        self.assertIn(brine, [result.recipe for result in search_recipes('brine')])
+
+    def test_rerun_continues_after_last_committed_chunk(self):
+        path = self.write('recipes.csv', (
+            'title,description,ingredients\n'
+            'First,One,Salt\n'
+            'Second,Two,Salt\n'
+            'Third,Three,\n'
+        ))
+        self.run_import(recipes=path)
+        self.write('recipes.csv', 'Fourth,Four,Salt\n')
+        stdout, _ = self.run_import(recipes=path)
+        self.assertIn('resuming after row 3', stdout)
+        titles = Recipe.objects.exclude(pk=self.soup.pk).values_list('title', flat=True)
+        self.assertEqual(sorted(titles), ['First', 'Fourth', 'Second', 'Third'])
+        self.run_import(recipes=path, restart=True)
+        self.assertEqual(Recipe.objects.filter(title='First').count(), 2)
+
+
+class TestBenchBaseline(TestCase):
+    BASELINE = {'p50_ms': 10.0, 'p99_ms': 20.0, 'queries': 3, 'bytes': 1000, 'peak_kib': 50.0}
+
+    def compare(self, **current):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+        with open(path, 'w') as file:
+            json.dump({'routes': {'index': self.BASELINE}}, file)
+        command = BenchCommand(stdout=StringIO(), stderr=StringIO())
+        results = {'routes': {'index': {**self.BASELINE, **current}}}
+        command.compare(results, path, threshold=10, min_ms=1.0)
+
+    def test_within_threshold_and_noise_pass(self):
+        self.compare(p50_ms=10.9, p99_ms=20.9, bytes=1090)
+
+    def test_extra_query_or_slower_page_fails(self):
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.compare(queries=4)
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.compare(p50_ms=12.0)
+
+    def test_bench_user_gets_the_edit_form(self):
+        command = BenchCommand(stdout=StringIO(), stderr=StringIO())
+        command.seed(recipes=5, ingredients=5, links=2)
+        url = dict(command.routes())['recipe_edit']
+        self.client.force_login(User.objects.get(username='bench'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<form')
+
+
+class TestSeedCatalog(TestCase):
+    def seed(self, **options):
+        call_command(
+            'seed_catalog', recipes=60, ingredients=40, authors=3, batch_size=25,
+            clear=True, stdout=StringIO(), **options
+        )
+        return list(Recipe.objects.order_by('pk').values_list(
+            'title', 'author__username', 'total_price', 'ingredients_count'
+        ))
+
+    def test_same_seed_same_catalog(self):
+        first = self.seed(seed=7)
+        self.assertEqual(len(first), 60)
+        self.assertEqual(Ingredient.objects.count(), 40)
+        self.assertEqual(User.objects.filter(username__startswith='seed-author-').count(), 3)
+        links = list(RecipeIngredient.objects.values_list('ingredient__name', flat=True))
+        self.assertEqual(self.seed(seed=7), first)
+        self.assertEqual(
+            list(RecipeIngredient.objects.values_list('ingredient__name', flat=True)), links
+        )
+        self.assertNotEqual(self.seed(seed=8), first)
+
+    def test_totals_and_popularity(self):
+        self.seed(seed=1)
+        recipe = Recipe.objects.order_by('pk').first()
+        self.assertEqual(recipe.ingredients_count, recipe.ingredients.count())
+        self.assertGreater(recipe.total_price, 0)
+        # Zipf: первый ингредиент встречается чаще последнего
+        salt = RecipeIngredient.objects.filter(ingredient__name='Salt').count()
+        tail = RecipeIngredient.objects.filter(ingredient__name='Yeast 2').count()
+        self.assertGreater(salt, tail)
+        self.assertTrue(search_recipes(recipe.title.split()[1]))
+
+    def test_clear_after_repricing(self):
+        self.seed(seed=1)
+        pricing.reprice_by_percent(Decimal('10'))
+        self.seed(seed=1)
+        self.assertFalse(PriceHistory.objects.exists())
+        connection.check_constraints()
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'views': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_clear_invalidates_recipe_pages(self):
+        before = get_versions([ALL_RECIPES])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed(seed=1)
+        self.assertNotEqual(get_versions([ALL_RECIPES]), before)
+
+
+class TestSqliteProfile(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        values = sqlite_tools.pragmas(connection)
+        self.assertEqual(values['busy_timeout'], 5000)
+        # NORMAL только вместе с WAL, иначе FULL по умолчанию
+        self.assertEqual(values['synchronous'], 1 if settings.SQLITE_WAL else 2)
+        self.assertEqual(values['temp_store'], 2)  # MEMORY
+        self.assertEqual(values['cache_size'], -64000)
+
+    def test_optimize_command(self):
+        out = StringIO()
+        call_command('optimize_db', analyze=True, show_pragmas=True, stdout=out)
+        self.assertIn('ANALYZE done', out.getvalue())
+        self.assertIn('busy_timeout = 5000', out.getvalue())
+
+
+class TestSqliteBackup(TransactionTestCase):
+    def test_online_backup_is_a_complete_copy(self):
+        Ingredient.objects.create(name='Salt', weight=1, weight_ready=1, price=1)
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'backup.sqlite3')
+            steps = []
+            sqlite_tools.backup(
+                connection, target, pages=2,
+                progress=lambda remaining, total: steps.append(remaining),
+            )
+            self.assertGreater(len(steps), 1)
+            self.assertFalse(os.path.exists(target + '.partial'))
+            copy = sqlite3.connect(target)
+            try:
+                names = copy.execute(
+                    f'SELECT name FROM {Ingredient._meta.db_table}'
+                ).fetchall()
+                mode = copy.execute('PRAGMA journal_mode').fetchone()[0]
+            finally:
+                copy.close()
+        self.assertEqual(names, [('Salt',)])
+        self.assertEqual(mode, 'delete')
+
+    def test_sync_replica_writes_read_only_copy(self):
+        Ingredient.objects.create(name='Salt', weight=1, weight_ready=1, price=1)
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'replica.sqlite3')
+            call_command('sync_replica', target=target, stdout=StringIO())
+            replica = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+            try:
+                count = replica.execute(
+                    f'SELECT COUNT(*) FROM {Ingredient._meta.db_table}'
+                ).fetchone()[0]
+            finally:
+                replica.close()
+        self.assertEqual(count, 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=30)
+class TestReplicaRouting(SimpleTestCase):
+    """Без транзакции TestCase: внутри неё всё читается с primary"""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def view(self, request):
+        if request.method == 'POST':
+            self.router.db_for_write(Recipe)
+        return HttpResponse(self.router.db_for_read(Recipe))
+
+    def get(self, method='get', cookies=None):
+        request = getattr(self.factory, method)('/')
+        request.COOKIES.update(cookies or {})
+        # Пустой контекст: записи других тестов не прикрепляют к primary
+        return Context().run(routers.ReplicaPinningMiddleware(self.view), request)
+
+    def test_catalog_reads_go_to_replica_until_a_write(self):
+        def scenario():
+            reads = [self.router.db_for_read(model) for model in (Recipe, User)]
+            writes = self.router.db_for_write(Recipe)
+            return reads, writes, self.router.db_for_read(Recipe)
+
+        self.assertEqual(
+            Context().run(scenario), (['replica', 'default'], 'default', 'default')
+        )
+
+    def test_client_sticks_to_primary_after_write(self):
+        self.assertEqual(self.get().content, b'replica')
+        response = self.get('post')
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 30)
+        self.assertEqual(
+            self.get(cookies={cookie.key: cookie.value}).content, b'default'
+        )
+        self.assertEqual(
+            self.get(cookies={cookie.key: cookie.value + 'x'}).content, b'replica'
+        )
+        self.assertEqual(self.get().content, b'replica')
+
+    def test_async_requests_are_pinned_too(self):
+        async def view(request):
+            return self.view(request)
+
+        middleware = routers.ReplicaPinningMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = Context().run(async_to_sync(middleware), self.factory.post('/'))
+        self.assertEqual(response.content, b'default')
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_nothing_to_do_without_replicas(self):
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = self.get('post')
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies, {})
+
+
+class TestIngredientBulkEdit(TestCase):
+    URL = reverse('recipe_catalog:ingredients_bulk_edit')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='editor', password='pass')
+        cls.flour, cls.salt, cls.sugar = (
+            Ingredient.objects.create(
+                name=name, weight=100, weight_ready=100, price=Decimal(price)
+            )
+            for name, price in (('Flour', '2.00'), ('Salt', '1.00'), ('Sugar', '3.00'))
+        )
+        cls.cake = Recipe.objects.create(title='Cake', description='-')
+        cls.cake.ingredients.set([cls.flour, cls.sugar])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def load(self):
+        """POST data of the page exactly as the browser would send it back"""
+        formset = self.client.get(self.URL).context['formset']
+        data = {
+            formset.management_form.add_prefix(name): field.value()
+            for name, field in ((f.name, f) for f in formset.management_form)
+        }
+        for form in formset:
+            for field in form:
+                data[field.html_name] = field.value()
+        return data, {form.instance.name: form.prefix for form in formset}
+
+    def test_only_changed_rows_saved_in_one_update(self):
+        data, rows = self.load()
+        data[f'{rows["Flour"]}-price'] = '5.00'
+        data[f'{rows["Sugar"]}-weight'] = '150'
+        salt_version = Ingredient.objects.get(pk=self.salt.pk).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.URL, data)
+        # До assertRedirects: новый запрос очищает журнал
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(f'UPDATE "{Ingredient._meta.db_table}"')
+        ]
+        # Названия не менялись: поисковые документы не трогаем
+        reindexed = [query['sql'] for query in queries if FTS_TABLE in query['sql']]
+        self.assertRedirects(response, self.URL)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(reindexed, [])
+        self.assertEqual(Ingredient.objects.get(pk=self.flour.pk).price, Decimal('5.00'))
+        self.assertEqual(Ingredient.objects.get(pk=self.salt.pk).updated_at, salt_version)
+        self.cake.refresh_from_db()
+        self.assertEqual((self.cake.total_price, self.cake.total_weight), (Decimal('8.00'), 250))
+
+    def test_concurrent_edit_is_a_conflict(self):
+        data, rows = self.load()
+        Ingredient.objects.filter(pk=self.flour.pk).update(
+            price=Decimal('9.00'), updated_at=timezone.now()
+        )
+        data[f'{rows["Flour"]}-price'] = '5.00'
+        data[f'{rows["Sugar"]}-price'] = '4.00'
+        response = self.client.post(self.URL, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Changed by someone else')
+        # Вся страница в одной транзакции: ничего не сохранено
+        self.assertEqual(Ingredient.objects.get(pk=self.flour.pk).price, Decimal('9.00'))
+        self.assertEqual(Ingredient.objects.get(pk=self.sugar.pk).price, Decimal('3.00'))
+
+    def test_stale_unedited_row_is_not_a_conflict(self):
+        data, rows = self.load()
+        Ingredient.objects.filter(pk=self.salt.pk).update(
+            price=Decimal('7.00'), updated_at=timezone.now()
+        )
+        data[f'{rows["Flour"]}-price'] = '5.00'
+        self.assertEqual(self.client.post(self.URL, data).status_code, 302)
+        self.assertEqual(Ingredient.objects.get(pk=self.salt.pk).price, Decimal('7.00'))
+
+
+class TestReprice(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='boss', password='pass')
+        cls.flour, cls.salt, cls.sugar = (
+            Ingredient.objects.create(
+                name=name, weight=100, weight_ready=100, price=Decimal(price)
+            )
+            for name, price in (('Flour', '2.00'), ('Salt', '1.00'), ('Sugar', '3.00'))
+        )
+        cls.cake = Recipe.objects.create(title='Cake', description='-')
+        cls.cake.ingredients.set([cls.flour, cls.sugar])
+
+    def prices(self):
+        return dict(Ingredient.objects.values_list('name', 'price'))
+
+    def test_percent_is_one_update_with_history(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = pricing.reprice_by_percent(Decimal('7'), source='+7%')
+        updates = [
+            query for query in queries
+            if query['sql'].startswith(f'UPDATE "{Ingredient._meta.db_table}"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual((result.ingredients, result.recipes), (3, 1))
+        self.assertEqual(self.prices(), {
+            'Flour': Decimal('2.14'), 'Salt': Decimal('1.07'), 'Sugar': Decimal('3.21'),
+        })
+        history = PriceHistory.objects.get(ingredient=self.sugar)
+        self.assertEqual((history.old_price, history.new_price), (Decimal('3.00'), Decimal('3.21')))
+        self.assertEqual(history.source, '+7%')
+        self.cake.refresh_from_db()
+        self.assertEqual(self.cake.total_price, Decimal('5.35'))
+
+    def test_percent_rounds_half_a_cent_up(self):
+        tea = Ingredient.objects.create(
+            name='Tea', weight=100, weight_ready=100, price=Decimal('2.50')
+        )
+        pricing.reprice_by_percent(Decimal('7'), Ingredient.objects.filter(pk=tea.pk))
+        # 2.50 * 1.07 = 2.675
+        self.assertEqual(self.prices()['Tea'], Decimal('2.68'))
+
+    def test_batch_ignores_history_with_the_same_time(self):
+        now = timezone.now()
+        PriceHistory.objects.create(
+            ingredient=self.salt, old_price=Decimal('1.00'), new_price=Decimal('9.00'),
+            changed_at=now,
+        )
+        with mock.patch('recipe_catalog.pricing.timezone.now', return_value=now):
+            result = pricing.reprice_by_percent(
+                Decimal('10'), Ingredient.objects.filter(pk=self.flour.pk)
+            )
+        self.assertEqual(result.ingredients, 1)
+        self.assertEqual(self.prices()['Salt'], Decimal('1.00'))
+        self.assertEqual(self.prices()['Flour'], Decimal('2.20'))
+
+    def test_price_list_changes_only_differing_prices(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('name,price\nFlour,2.50\nSalt,1.00\nUnknown,9.00\nSugar,oops\n')
+        self.addCleanup(os.remove, file.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('reprice_ingredients', file=file.name, stdout=stdout, stderr=stderr)
+        self.assertIn('1 ingredients repriced, 1 recipes updated', stdout.getvalue())
+        self.assertIn('row 4', stderr.getvalue())
+        self.assertEqual(self.prices()['Flour'], Decimal('2.50'))
+        self.assertEqual(self.prices()['Sugar'], Decimal('3.00'))
+        self.assertQuerysetEqual(
+            PriceHistory.objects.values_list('ingredient__name', flat=True), ['Flour']
+        )
+
+    def test_admin_action_asks_for_percent_then_reprices_selection(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:recipe_catalog_ingredient_changelist')
+        data = {'action': 'reprice', '_selected_action': [self.salt.pk, self.sugar.pk]}
+        response = self.client.post(url, data)
+        self.assertContains(response, '2 ingredients will be repriced')
+        response = self.client.post(url, {**data, 'percent': '-10', 'apply': 'Reprice'})
+        self.assertRedirects(response, url)
+        self.assertEqual(self.prices(), {
+            'Flour': Decimal('2.00'), 'Salt': Decimal('0.90'), 'Sugar': Decimal('2.70'),
+        })
+        self.assertEqual(PriceHistory.objects.count(), 2)
+
+
+class TestWarmup(SimpleTestCase):
+    def test_templates_are_compiled_into_the_cached_loader(self):
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        self.assertGreater(warmup.compile_templates(), 10)
+        self.assertTrue(any(
+            name.startswith('recipe_catalog/index.html') for name in loader.get_template_cache
+        ))
+
+    def test_every_named_route_is_resolved(self):
+        count = warmup.resolve_urls()
+        self.assertGreaterEqual(count, 20)
+        pattern = next(
+            p for p in catalog_urls.urlpatterns if getattr(p, 'name', None) == 'recipe_detail'
+        )
+        self.assertEqual(warmup._url_kwargs(pattern), {'pk': '1'})
+
+    def test_lazy_modules_are_imported(self):
+        self.assertGreater(warmup.import_modules(), 3)
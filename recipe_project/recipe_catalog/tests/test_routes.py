@@ -1,9 +1,30 @@
-from django.test import TestCase, Client
+import gzip
+import shutil
+import tempfile
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, Client, override_settings
+)
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from http import HTTPStatus
+from recipe_catalog import async_views
+from recipe_catalog.middleware import (
+    CompressionMiddleware, DuplicateQueriesError, QueryStatsMiddleware, StaticFilesMiddleware,
+    accepted_encodings, normalize_sql, response_sizes,
+)
 from recipe_catalog.models import Recipe, Ingredient, RecipeIngredient
+from recipe_catalog.pagination import EstimatedCountPaginator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta
+from decimal import Decimal
 
 User = get_user_model()
 
@@ -84,4 +105,496 @@ class RouteTestCase(TestCase):
         """Test authentication-related routes"""
         login_url = '/auth/login/'
         response = self.client.get(login_url)
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+@override_settings(AUTOCOMPLETE_PAGE_SIZE=2)
+class IngredientAutocompleteTestCase(TestCase):
+    URL = reverse('recipe_catalog:ingredient_autocomplete')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='testpass')
+        for name in ('Tomato', 'tomato paste', 'Cherry tomatoes', 'Potato', 'Tofu'):
+            Ingredient.objects.create(name=name, weight=1, weight_ready=1, price=1)
+
+    def fetch_all(self, query):
+        names, token = [], ''
+        while True:
+            data = self.client.get(self.URL, {'q': query, 'next': token}).json()
+            names.extend(item['text'] for item in data['results'])
+            if not data['pagination']['more']:
+                return names
+            token = data['next']
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.fetch_all('tom'), ['Tomato', 'tomato paste', 'Cherry tomatoes']
+        )
+
+    def test_short_query_is_prefix_only(self):
+        self.assertEqual(self.fetch_all('to'), ['Tofu', 'Tomato', 'tomato paste'])
+
+    def test_prefix_search_uses_the_name_index(self):
+        # Индекс должен пережить пересборки таблицы в более поздних миграциях
+        plan = Ingredient.objects.filter(name__istartswith='tom').order_by('name').explain()
+        self.assertIn('ingredient_name_ci_idx', plan)
+
+    def test_recipe_form_renders_only_selected_ingredients(self):
+        recipe = Recipe.objects.create(title='Soup', description='Soup', author=self.user)
+        recipe.ingredients.set(Ingredient.objects.filter(name='Potato'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('recipe_catalog:recipe_edit', args=[recipe.pk]))
+        self.assertContains(response, 'Potato')
+        self.assertNotContains(response, 'Tofu')
+        self.assertContains(response, f'data-autocomplete-url="{self.URL}"')
+
+
+class ConditionalGetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredient = Ingredient.objects.create(
+            name='Rice', weight=100, weight_ready=250, price=Decimal('3.00')
+        )
+        cls.recipe = Recipe.objects.create(title='Pilaf', description='Rice')
+        cls.recipe.ingredients.set([cls.ingredient])
+        cls.detail_url = reverse('recipe_catalog:recipe_detail', args=[cls.recipe.pk])
+
+    def assertRevalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(cached.content, b'')
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        return response['ETag']
+
+    def test_detail_revalidates_until_ingredient_price_changes(self):
+        etag = self.assertRevalidates(self.detail_url)
+        self.ingredient.price = Decimal('3.50')
+        self.ingredient.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_index_revalidates_until_recipe_added(self):
+        index_url = reverse('recipe_catalog:index')
+        etag = self.assertRevalidates(index_url)
+        Recipe.objects.create(title='Couscous', description='Grain')
+        response = self.client.get(index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_ingredients_revalidate_until_ingredient_deleted(self):
+        url = reverse('recipe_catalog:ingredients')
+        etag = self.assertRevalidates(url)
+        self.ingredient.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_recipe_has_no_etag(self):
+        response = self.client.get(reverse('recipe_catalog:recipe_detail', args=[999]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotIn('ETag', response)
+
+
+class ApiTestCase(TestCase):
+    RECIPES_URL = reverse('recipe_catalog:api_recipes')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='testpass')
+        cls.tomato = Ingredient.objects.create(
+            name='Tomato', weight=100, weight_ready=90, price=Decimal('2.00')
+        )
+        cls.basil = Ingredient.objects.create(
+            name='Basil', weight=10, weight_ready=10, price=Decimal('1.00')
+        )
+        cls.recipes = []
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                title=f'Salad {number}', description='Fresh', author=cls.user
+            )
+            recipe.ingredients.set([cls.tomato, cls.basil])
+            cls.recipes.append(recipe)
+
+    def get(self, url, status=HTTPStatus.OK, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_page_embeds_ingredients_in_fixed_queries(self):
+        with self.assertNumQueries(2):
+            data = self.get(self.RECIPES_URL, limit=2)
+        self.assertEqual([r['title'] for r in data['results']], ['Salad 0', 'Salad 1'])
+        self.assertEqual(data['results'][0]['author'], 'cook')
+        self.assertEqual(data['results'][0]['total_price'], '3.00')
+        self.assertEqual(
+            [i['name'] for i in data['results'][0]['ingredients']], ['Basil', 'Tomato']
+        )
+        self.assertIsNone(data['previous'])
+        data = self.get(self.RECIPES_URL, limit=2, cursor=data['next'])
+        self.assertEqual([r['title'] for r in data['results']], ['Salad 2', 'Salad 3'])
+
+    def test_field_selection(self):
+        with self.assertNumQueries(1):
+            data = self.get(self.RECIPES_URL, fields='id,title', limit=1)
+        self.assertEqual(data['results'], [{'id': self.recipes[0].pk, 'title': 'Salad 0'}])
+        data = self.get(self.RECIPES_URL, HTTPStatus.BAD_REQUEST, fields='id,secret')
+        self.assertEqual(data['error'], 'Unknown fields: secret')
+
+    def test_batch_keeps_order_and_reports_missing(self):
+        ids = [self.recipes[3].pk, 999, self.recipes[1].pk]
+        with self.assertNumQueries(2):
+            data = self.get(self.RECIPES_URL, ids=','.join(map(str, ids)))
+        self.assertEqual([r['id'] for r in data['results']], [ids[0], ids[2]])
+        self.assertEqual(data['missing'], [999])
+        self.get(self.RECIPES_URL, HTTPStatus.BAD_REQUEST, ids='1,x')
+
+    def test_detail_revalidates_with_etag(self):
+        url = reverse('recipe_catalog:api_recipe', args=[self.recipes[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['ingredients_count'], 2)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        self.tomato.price = Decimal('2.50')
+        self.tomato.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['total_price'], '3.50')
+        self.get(reverse('recipe_catalog:api_recipe', args=[999]), HTTPStatus.NOT_FOUND)
+
+    def test_ingredients(self):
+        data = self.get(reverse('recipe_catalog:api_ingredients'), q='ba', fields='name')
+        self.assertEqual(data['results'], [{'name': 'Basil'}])
+        data = self.get(reverse('recipe_catalog:api_ingredient', args=[self.tomato.pk]))
+        self.assertEqual(data['price'], '2.00')
+        response = self.client.post(reverse('recipe_catalog:api_ingredients'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+class AsyncViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredient = Ingredient.objects.create(
+            name='Lentils', weight=200, weight_ready=500, price=Decimal('4.00')
+        )
+        cls.recipe = Recipe.objects.create(title='Dal', description='Spicy')
+        cls.recipe.ingredients.set([cls.ingredient])
+        cls.factory = AsyncRequestFactory()
+
+    def request(self, url, headers=None):
+        request = self.factory.get(url, headers=headers)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_pages_match_sync_views(self):
+        for name, args in [('index', []), ('recipe_detail', [self.recipe.pk]),
+                           ('ingredients', [])]:
+            url = reverse(f'recipe_catalog:{name}', args=args)
+            response = await getattr(async_views, name)(self.request(url), *args)
+            expected = await self.async_client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+    @override_settings(OBJS_ON_PAGE=1)
+    async def test_numbered_index_page(self):
+        await Recipe.objects.acreate(title='Khichdi', description='Rice')
+        url = reverse('recipe_catalog:index') + '?page=2'
+        response = await async_views.index(self.request(url))
+        expected = await self.async_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.content, expected.content)
+
+    async def test_recipe_detail_revalidates_and_404s(self):
+        url = reverse('recipe_catalog:recipe_detail', args=[self.recipe.pk])
+        response = await async_views.recipe_detail(self.request(url), self.recipe.pk)
+        self.assertContains(response, 'Lentils')
+        cached = await async_views.recipe_detail(
+            self.request(url, {'If-None-Match': response['ETag']}), self.recipe.pk
+        )
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        missing = await async_views.recipe_detail(self.request('/recipe/999/'), 999)
+        self.assertEqual(missing.status_code, HTTPStatus.NOT_FOUND)
+
+
+class QueryStatsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = [
+            Recipe.objects.create(title=f'Pie {number}', description='Baked')
+            for number in range(4)
+        ]
+
+    def n_plus_one(self, request):
+        for recipe in self.recipes:
+            list(RecipeIngredient.objects.filter(recipe=recipe))
+        return HttpResponse()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('recipe_catalog:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="1 queries", dup;desc="0 repeated", total;dur=[\d.]+$',
+        )
+
+    @override_settings(SQL_DUPLICATE_THRESHOLD=3)
+    def test_repeated_query_shape_fails_in_tests(self):
+        middleware = QueryStatsMiddleware(self.n_plus_one)
+        with self.assertRaisesMessage(DuplicateQueriesError, '4x SELECT'):
+            middleware(RequestFactory().get('/'))
+
+    @override_settings(SQL_DUPLICATE_THRESHOLD=3, SQL_DUPLICATE_RAISE=False)
+    def test_repeated_query_shape_is_logged(self):
+        middleware = QueryStatsMiddleware(self.n_plus_one)
+        with self.assertLogs('recipe_catalog.sql', 'INFO') as logs:
+            response = middleware(RequestFactory().get('/'))
+        self.assertIn('dup;desc="3 repeated"', response['Server-Timing'])
+        self.assertIn('"queries": 4', logs.output[0])
+        self.assertTrue(logs.output[1].startswith('WARNING'))
+
+    @override_settings(SQL_DUPLICATE_THRESHOLD=3)
+    async def test_async_requests_are_counted(self):
+        async def n_plus_one(request):
+            for recipe in self.recipes:
+                [item async for item in RecipeIngredient.objects.filter(recipe=recipe)]
+            return HttpResponse()
+
+        middleware = QueryStatsMiddleware(n_plus_one)
+        with self.assertRaisesMessage(DuplicateQueriesError, '4x SELECT'):
+            await middleware(AsyncRequestFactory().get('/'))
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t1 WHERE a IN (%s, %s) AND b = 'x''y' LIMIT 21"),
+            'SELECT * FROM t1 WHERE a IN (...) AND b = ? LIMIT ?',
+        )
+
+
+class RecipeAdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Spice {number:02}', weight=1, weight_ready=1, price=Decimal('1.00')
+            )
+            for number in range(25)
+        ]
+        cls.curry = Recipe.objects.create(
+            title='Curry', description='Hot ' * 100, author=cls.admin
+        )
+        cls.curry.ingredients.set(cls.ingredients)
+        cls.soup = Recipe.objects.create(title='Soup', description='Pumpkin')
+        cls.change_url = reverse('admin:recipe_catalog_recipe_change', args=[cls.curry.pk])
+        cls.changelist_url = reverse('admin:recipe_catalog_recipe_changelist')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    @override_settings(SQL_DUPLICATE_THRESHOLD=3)
+    def test_inline_is_paginated_and_labelled_without_queries(self):
+        response = self.client.get(self.change_url)
+        self.assertContains(response, 'Spice 19')
+        self.assertNotContains(response, 'Spice 20')
+        self.assertContains(
+            response,
+            f'<option value="{self.ingredients[0].pk}" selected>Spice 00</option>',
+            html=True,
+        )
+        response = self.client.get(self.change_url, {'links_page': 2})
+        self.assertContains(response, 'Spice 24')
+        self.assertNotContains(response, 'Spice 19')
+
+    def test_saving_a_page_of_links_keeps_the_other_pages(self):
+        url = f'{self.change_url}?links_page=2'
+        response = self.client.get(url)
+        data = {}
+        for form in [response.context['adminform'].form, *(
+            form for inline in response.context['inline_admin_formsets']
+            for form in [inline.formset.management_form, *inline.formset]
+        )]:
+            for field in form:
+                value = field.value()
+                # Пустой ImageField не отправляется, как и в браузере
+                if value:
+                    data[field.html_name] = value
+        formset = response.context['inline_admin_formsets'][0].formset
+        data[f'{formset.prefix}-0-DELETE'] = 'on'
+        self.assertRedirects(self.client.post(url, data), self.changelist_url)
+        self.assertEqual(self.curry.ingredients.count(), 24)
+        self.assertFalse(self.curry.ingredients.filter(name='Spice 20').exists())
+
+    def test_changelist_searches_full_text_and_truncates_description(self):
+        response = self.client.get(self.changelist_url)
+        self.assertNotContains(response, 'Hot ' * 30)
+        response = self.client.get(self.changelist_url, {'q': 'pumpk'})
+        self.assertContains(response, 'Soup')
+        self.assertNotContains(response, 'Curry')
+
+    def test_estimated_count_skips_count_on_whole_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as queries:
+            count = EstimatedCountPaginator(Recipe.objects.order_by('pk'), 10).count
+        self.assertEqual(count, 2)
+        self.assertNotIn('COUNT(', queries[0]['sql'])
+        filtered = EstimatedCountPaginator(Recipe.objects.filter(title='Soup').order_by('pk'), 10)
+        self.assertEqual(filtered.count, 1)
+
+
+class StaticFilesTestCase(SimpleTestCase):
+    """collectstatic output served by StaticFilesMiddleware"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, root)
+        cls.enterClassContext(override_settings(
+            STATIC_ROOT=root, DEBUG=False, SERVE_STATIC=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {
+                    'BACKEND': 'recipe_catalog.storage.CompressedManifestStaticFilesStorage',
+                },
+            },
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_vendored_css_is_hashed_and_precompressed(self):
+        url = static('vendor/w3css/w3.css')
+        self.assertRegex(url, r'^/static/vendor/w3css/w3\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'.w3-bar', body)
+
+    def test_identity_and_unhashed_names(self):
+        response = self.client.get('/static/styles.css', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+
+        response = self.client.get(
+            '/static/styles.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    async def test_served_without_the_rest_of_an_async_chain(self):
+        async def application(request):
+            return HttpResponse('app')
+
+        middleware = StaticFilesMiddleware(application)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = AsyncRequestFactory()
+        response = await middleware(factory.get('/static/styles.css'))
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+        response.close()
+        response = await middleware(factory.get('/about/'))
+        self.assertEqual(response.content, b'app')
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.client.get('/static/nope.css').status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(
+            self.client.get('/static/../manage.py').status_code, HTTPStatus.NOT_FOUND
+        )
+
+    def test_pages_use_no_external_assets(self):
+        for template in ('recipe_catalog/about.html', 'recipe_catalog/404.html'):
+            with self.subTest(template=template):
+                html = render_to_string(template)
+                self.assertNotIn('https://', html)
+                self.assertIn(static('vendor/w3css/w3.css'), html)
+
+    def test_unhashed_urls_before_collectstatic(self):
+        with tempfile.TemporaryDirectory() as root, self.settings(STATIC_ROOT=root):
+            self.assertEqual(static('vendor/w3css/w3.css'), '/static/vendor/w3css/w3.css')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('br;q=1.0, gzip;q=0, *'), {'br', '*'})
+        self.assertEqual(accepted_encodings(''), set())
+
+
+@override_settings(COMPRESS_MIN_SIZE=200)
+class CompressionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', password='testpass', is_staff=True
+        )
+        cls.recipe = Recipe.objects.create(
+            title='Борщ', description='Свекла ' * 200, cooking_time=timedelta(minutes=90)
+        )
+
+    def setUp(self):
+        response_sizes.reset()
+
+    def test_html_is_gzipped_for_clients_that_accept_it(self):
+        url = reverse('recipe_catalog:recipe_detail', kwargs={'pk': self.recipe.pk})
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        stats = response_sizes.report()['recipe/<int:pk>/']
+        self.assertEqual(stats['responses'], 2)
+        self.assertEqual(stats['bytes'], 2 * len(plain.content))
+        self.assertEqual(stats['sent_bytes'], len(plain.content) + len(response.content))
+
+    def test_small_and_other_responses_are_left_alone(self):
+        with self.settings(COMPRESS_MIN_SIZE=10 ** 6):
+            response = self.client.get(
+                reverse('recipe_catalog:about'), HTTP_ACCEPT_ENCODING='gzip'
+            )
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('Accept-Encoding', response.get('Vary', ''))
+
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse('x' * 5000, content_type='text/plain')
+        )
+        response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_export_is_compressed_as_it_goes(self):
+        self.client.force_login(self.user)
+        url = reverse(
+            'recipe_catalog:export', kwargs={'kind': 'recipes', 'export_format': 'ndjson'}
+        )
+        plain = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+        stats = response_sizes.report()['export/<str:kind>.<str:export_format>']
+        self.assertEqual(stats['bytes'], 2 * len(plain))
+        self.assertLess(stats['ratio'], 1)
+
+    def test_unresolved_paths_share_one_route(self):
+        for path in ('/no-such-page/', '/no-such-page-either/', '/x/y/z/'):
+            self.assertEqual(self.client.get(path).status_code, HTTPStatus.NOT_FOUND)
+        report = response_sizes.report()
+        self.assertEqual(list(report), ['<unresolved>'])
+        self.assertEqual(report['<unresolved>']['responses'], 3)
+
+    def test_response_stats_page_is_for_staff(self):
+        url = reverse('recipe_catalog:response_stats')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.user)
+        self.client.get(reverse('recipe_catalog:about'))
+        self.assertIn('about/', self.client.get(url).json())
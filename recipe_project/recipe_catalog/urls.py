@@ -1,20 +1,37 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from . import views
+from . import api, async_views, views
 
 app_name = 'recipe_catalog'
 
+# Под ASGI страницы только для чтения обслуживаются async-версиями
+pages = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.index, name='index'),
+    path('', pages.index, name='index'),
     path('recipe/', views.recipe, name='recipe'),
-    path('recipe/<int:pk>/', views.recipe_detail, name='recipe_detail'),
+    path('recipe/<int:pk>/', pages.recipe_detail, name='recipe_detail'),
     path('recipe/<int:pk>/edit/', views.recipe_edit, name='recipe_edit'),
     path('recipe/<int:pk>/delete/', views.recipe_delete, name='recipe_delete'),
+    path('search/', views.search, name='search'),
+    path('pantry/', views.pantry, name='pantry'),
     path('about/', views.about, name='about'),
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
+    path('response-stats/', views.response_stats_view, name='response_stats'),
+    path('export/<str:kind>.<str:export_format>', views.export, name='export'),
     path('form_user_test/', views.form_user_test, name='create_user_test'),
-    path('ingredients/', views.ingredients, name='ingredients'),
+    path('ingredients/', pages.ingredients, name='ingredients'),
     path('ingredient/', views.ingredient, name='ingredient'),
+    path(
+        'ingredients/edit/',
+        views.ingredients_bulk_edit,
+        name='ingredients_bulk_edit'
+    ),
+    path(
+        'ingredients/autocomplete/',
+        views.ingredient_autocomplete,
+        name='ingredient_autocomplete'
+    ),
     path(
         'ingredient/<int:pk>/edit/',
         views.ingredient_edit,
@@ -25,5 +42,14 @@ urlpatterns = [
         views.ingredient_delete,
         name='ingredient_delete'
     ),
+    path('api/recipes/', api.recipes, name='api_recipes'),
+    path('api/recipes/<int:pk>/', api.recipe, name='api_recipe'),
+    path('api/ingredients/', api.ingredients, name='api_ingredients'),
+    path('api/ingredients/<int:pk>/', api.ingredient, name='api_ingredient'),
     path('auth/', include('django.contrib.auth.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(
+        r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+        views.media,
+        name='media'
+    ),
+]
@@ -1,39 +1,205 @@
-from django.http import HttpResponse
+import mimetypes
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.contrib.auth.decorators import login_required
+from django.utils._os import safe_join
+from django.views.static import serve
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
-from .forms import IngredientForm, RecipeForm, UserForm
-from .models import Ingredient, Recipe
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from .cache import RECIPE_LIST, cache_stats, cache_view, recipe_versions
+from .conditional import conditional_page
+from .export import FORMATS, KINDS, export_lines
+from .forms import (
+    IngredientBulkFormSet, IngredientForm, PantryForm, RecipeForm, UserForm
+)
+from .middleware import response_sizes
+from .models import Ingredient, Recipe, RecipeIngredient
+from .pagination import KeysetPaginator
+from .pantry import index as pantry_index
+from .search import search_recipes
+from .signals import ingredients_changed
+from .storage import is_content_addressed
+
+
+# Поддерживаемые сортировки главной страницы: ?order=<ключ>
+INDEX_ORDERINGS = {
+    'title': ('title', 'id'),
+    'price': ('total_price', 'id'),
+}
+
+
+def _index_order(request):
+    order = request.GET.get('order')
+    if order not in INDEX_ORDERINGS:
+        order = 'title'
+    return order, INDEX_ORDERINGS[order]
+
+
+def _index_queryset():
+    return Recipe.objects.only('id', 'title', 'total_price', 'updated_at')
+
+
+def _index_page(request):
+    """Page of recipes for the index: keyset by default, ?page=N for old links"""
+    # Один запрос на страницу: его используют и ETag, и шаблон
+    if hasattr(request, '_index_page'):
+        return request._index_page
+    order, ordering = _index_order(request)
+    queryset = _index_queryset()
+    if 'page' in request.GET:
+        # Старые ссылки ?page=N: COUNT(*) + OFFSET
+        paginator = Paginator(queryset.order_by(*ordering), settings.OBJS_ON_PAGE)
+        page = paginator.get_page(request.GET.get('page'))
+    else:
+        paginator = KeysetPaginator(queryset, ordering, settings.OBJS_ON_PAGE)
+        page = paginator.get_page(request.GET.get('cursor'))
+    request._index_page = page, order
+    return request._index_page
+
+
+def _page_meta(request, page):
+    rows = [(recipe.id, recipe.updated_at) for recipe in page]
+    last_modified = max((updated for _, updated in rows), default=None)
+    return (request.GET.urlencode(), rows, page.has_next(), page.has_previous()), last_modified
+
+
+def _index_meta(request):
+    page, _ = _index_page(request)
+    return _page_meta(request, page)
 
 
 # Главная страница, Вывод списка рецептов
+@cache_view(lambda request: [RECIPE_LIST])
+@conditional_page(_index_meta)
 def index(request):
-    recipes_list = Recipe.objects.order_by('title')
-    paginator = Paginator(recipes_list, 10)
-    page_number = request.GET.get('page')
-    recipes = paginator.get_page(page_number)
-    return render(request, 'recipe_catalog/index.html', {'recipes': recipes})
+    recipes, order = _index_page(request)
+    context = {'recipes': recipes, 'order': order}
+    return render(request, 'recipe_catalog/index.html', context)
 
 
 def about(request):
     return render(request, 'recipe_catalog/about.html')
 
 
+def _recipe_detail_meta(request, pk):
+    updated_at = Recipe.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return (pk, updated_at), updated_at
+
+
+@cache_view(lambda request, pk: recipe_versions(pk))
+@conditional_page(_recipe_detail_meta)
 def recipe_detail(request, pk):
     try:
         recipe = Recipe.objects.get(pk=pk)
     except Recipe.DoesNotExist:
         return handle_error_404(request)
-    context = {
+    return render(
+        request, 'recipe_catalog/recipe.html',
+        _recipe_context(recipe, recipe.ingredients.order_by('name')),
+    )
+
+
+def _recipe_context(recipe, ingredients):
+    return {
         'recipe_id': recipe.id,
         'title': recipe.title,
         'cooking_time': recipe.cooking_time,
         'image': recipe.image,
         'description': recipe.description,
-        'ingredients': recipe.ingredients.order_by('name'),
+        'ingredients': ingredients,
+        'total_price': recipe.total_price,
+        'total_weight': recipe.total_weight,
+        'total_weight_ready': recipe.total_weight_ready,
     }
-    return render(request, 'recipe_catalog/recipe.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = search_recipes(query, limit=settings.SEARCH_RESULTS_LIMIT)
+    context = {'query': query, 'results': results}
+    return render(request, 'recipe_catalog/search.html', context)
+
+
+def pantry(request):
+    """Что приготовить из того, что есть: рецепты по доле имеющихся ингредиентов"""
+    form = PantryForm(request.GET or None)
+    results, total = [], 0
+    if form.is_valid():
+        have = {ingredient.pk for ingredient in form.cleaned_data['ingredients']}
+        matches, total = pantry_index.search(
+            have, form.cleaned_data['missing'] or 0, settings.PANTRY_RESULTS_LIMIT
+        )
+        recipes = Recipe.objects.only('id', 'title', 'total_price').in_bulk(
+            [match.recipe_id for match in matches]
+        )
+        lacking = {}
+        links = RecipeIngredient.objects.filter(
+            recipe__in=list(recipes)
+        ).exclude(ingredient__in=have).values_list('recipe_id', 'ingredient__name')
+        for recipe_id, name in links:
+            lacking.setdefault(recipe_id, []).append(name)
+        results = [
+            {
+                'recipe': recipes[match.recipe_id],
+                'present': match.present,
+                'total': match.present + match.missing,
+                'lacking': sorted(lacking.get(match.recipe_id, [])),
+            }
+            # Рецепт мог быть удалён в другом процессе
+            for match in matches if match.recipe_id in recipes
+        ]
+    context = {'form': form, 'results': results, 'total': total}
+    return render(request, 'recipe_catalog/pantry.html', context)
+
+
+@user_passes_test(lambda user: user.is_staff)
+def cache_stats_view(request):
+    return JsonResponse(cache_stats())
+
+
+@user_passes_test(lambda user: user.is_staff)
+def response_stats_view(request):
+    """Body bytes per route before/after compression, for this worker"""
+    return JsonResponse(response_sizes.report())
+
+
+@login_required
+def export(request, kind, export_format):
+    if kind not in KINDS or export_format not in FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        export_lines(kind, export_format), content_type=FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+    return response
+
+
+def media(request, path):
+    """Uploaded files; behind nginx the bytes go out via X-Accel-Redirect"""
+    try:
+        safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse()
+        response['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+    else:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
 
 
 def handle_error_404(request):
@@ -76,12 +242,115 @@ def ingredient_edit(request, pk):
     return render(request, 'recipe_catalog/ingredient_form.html', context)
 
 
+# Count ловит удаления, которые не двигают Max(updated_at)
+INGREDIENTS_VERSION = {'last': Max('updated_at'), 'count': Count('id')}
+
+
+def _ingredients_meta(request):
+    meta = Ingredient.objects.aggregate(**INGREDIENTS_VERSION)
+    return (meta['count'], meta['last']), meta['last']
+
+
+@conditional_page(_ingredients_meta)
 def ingredients(request):
     ingredients = Ingredient.objects.all()
     context = {'ingredients': ingredients}
     return render(request, 'recipe_catalog/ingredients.html', context)
 
 
+def _posted_ids(data, prefix):
+    """pk of every row of a bound formset, read before the formset exists"""
+    try:
+        total = int(data.get(f'{prefix}-TOTAL_FORMS', 0))
+    except ValueError:
+        return []
+    ids = (
+        data.get(f'{prefix}-{i}-id', '')
+        for i in range(min(total, settings.INGREDIENTS_BULK_PAGE_SIZE))
+    )
+    return [pk for pk in ids if pk.isdigit()]
+
+
+def _save_ingredients(formset):
+    """One bulk_update of the edited rows, return how many were saved"""
+    edited = [form for form in formset.forms if form.edited]
+    ingredients = [form.instance for form in edited]
+    if not ingredients:
+        return 0
+    now = timezone.now()
+    for ingredient in ingredients:
+        ingredient.updated_at = now
+    Ingredient.objects.bulk_update(ingredients, [*Ingredient.RECIPE_FIELDS, 'updated_at'])
+    # bulk_update не шлёт post_save: рецепты обновляем сами одним проходом,
+    # поисковые документы — только если сменилось название
+    ingredients_changed(
+        [ingredient.pk for ingredient in ingredients],
+        reindex=any('name' in form.changed_data for form in edited),
+    )
+    return len(ingredients)
+
+
+@login_required
+def ingredients_bulk_edit(request):
+    """A page of ingredients edited at once: one transaction, one bulk_update"""
+    page = None
+    if request.method == 'POST':
+        prefix = IngredientBulkFormSet.get_default_prefix()
+        with transaction.atomic():
+            # Строки блокируются до конца транзакции: проверка версии надёжна
+            rows = list(Ingredient.objects.select_for_update().filter(
+                pk__in=_posted_ids(request.POST, prefix)
+            ).order_by('name', 'id'))
+            formset = IngredientBulkFormSet(request.POST, queryset=rows)
+            saved = _save_ingredients(formset) if formset.is_valid() else None
+        if saved is not None:
+            messages.success(request, f'{saved} ingredients saved')
+            return redirect(request.get_full_path())
+    else:
+        paginator = KeysetPaginator(
+            Ingredient.objects.all(), ('name', 'id'), settings.INGREDIENTS_BULK_PAGE_SIZE
+        )
+        page = paginator.get_page(request.GET.get('cursor'))
+        formset = IngredientBulkFormSet(queryset=page.object_list)
+    context = {'formset': formset, 'page': page}
+    return render(request, 'recipe_catalog/ingredients_bulk_edit.html', context)
+
+
+def ingredient_autocomplete(request):
+    """JSON for select2: prefix matches first, then (3+ chars) substring ones"""
+    query = request.GET.get('q', '').strip()
+    phases = [('p', Ingredient.objects.filter(name__istartswith=query))]
+    if len(query) >= 3:
+        phases.append(('s', Ingredient.objects.filter(name__icontains=query)
+                       .exclude(name__istartswith=query)))
+    # next = '<фаза>:<курсор>', курсор листает фазу по (name, id)
+    phase, _, cursor = request.GET.get('next', '').partition(':')
+    keys = [key for key, _ in phases]
+    start = keys.index(phase) if phase in keys else 0
+
+    results, next_token = [], None
+    for i, (key, queryset) in enumerate(phases[start:], start):
+        paginator = KeysetPaginator(
+            queryset.only('id', 'name'), ('name', 'id'),
+            settings.AUTOCOMPLETE_PAGE_SIZE - len(results),
+        )
+        page = paginator.get_page(cursor)
+        results.extend(page)
+        if page.has_next():
+            next_token = f'{key}:{page.next_cursor}'
+            break
+        cursor = None
+        if len(results) == settings.AUTOCOMPLETE_PAGE_SIZE:
+            if i + 1 < len(phases):
+                next_token = f'{phases[i + 1][0]}:'
+            break
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': obj.name} for obj in results],
+        'pagination': {'more': next_token is not None},
+        'next': next_token,
+    })
+
+
 def ingredient_delete(request, pk):
     instance = get_object_or_404(Ingredient, pk=pk)
     form = IngredientForm(instance=instance)
@@ -0,0 +1,142 @@
+"""
+Work done once before gunicorn forks its workers (see gunicorn.conf.py).
+
+With preload_app the master imports Django and builds the WSGI handler
+(middleware); warm_up() then compiles every template into the cached
+loader, populates the URL resolvers (importing every view on the way),
+imports what Django otherwise imports on the first request, loads the
+locale and primes small lookup tables.
+Workers forked afterwards share all of it copy-on-write, so neither a
+fresh deploy nor a recycled worker pays for it on its first requests.
+
+Connections opened here are closed again: a database connection must not
+be shared with forked processes. Each worker opens its own in connect().
+"""
+import re
+import time
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import NoReverseMatch, Resolver404, URLResolver, get_resolver, resolve, reverse
+from django.utils import formats, translation
+from django.utils.module_loading import import_string
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+# Значения параметров маршрутов: первое, подходящее под regex конвертера
+URL_ARGUMENT_SAMPLES = ('1', 'x', '00000000-0000-0000-0000-000000000000')
+
+
+def compile_templates():
+    """Compile every template of the template dirs, return how many"""
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        names = set()
+        for loader in engine.engine.template_loaders:
+            for directory in map(Path, loader.get_dirs()):
+                names.update(
+                    path.relative_to(directory).as_posix()
+                    for path in directory.rglob('*')
+                    if path.suffix in TEMPLATE_EXTENSIONS and path.is_file()
+                )
+        for name in sorted(names):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                # Фрагменты вроде шаблонов виджетов других движков не собираются
+                continue
+            count += 1
+    return count
+
+
+def _url_kwargs(pattern):
+    kwargs = {}
+    for name, converter in pattern.pattern.converters.items():
+        sample = next(
+            (value for value in URL_ARGUMENT_SAMPLES if re.fullmatch(converter.regex, value)),
+            None,
+        )
+        if sample is None:
+            return None
+        kwargs[name] = sample
+    return kwargs
+
+
+def resolve_urls():
+    """Reverse and resolve every named route, return how many"""
+    count = 0
+
+    def walk(patterns, namespace):
+        nonlocal count
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, ':'.join(filter(None, [namespace, pattern.namespace])))
+                continue
+            kwargs = _url_kwargs(pattern)
+            if not pattern.name or kwargs is None:
+                continue
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            try:
+                resolve(reverse(name, kwargs=kwargs))
+            except (NoReverseMatch, Resolver404):
+                continue
+            count += 1
+
+    walk(get_resolver().url_patterns, '')
+    return count
+
+
+def import_modules():
+    """Backends and context processors Django imports on first use"""
+    import_module(settings.SESSION_ENGINE)
+    names = {
+        settings.SESSION_SERIALIZER,
+        settings.MESSAGE_STORAGE,
+        *(cache['BACKEND'] for cache in settings.CACHES.values()),
+    }
+    for name in names:
+        import_string(name)
+    processors = [
+        engine.engine.template_context_processors
+        for engine in engines.all() if isinstance(engine, DjangoTemplates)
+    ]
+    return 1 + len(names) + sum(map(len, processors))
+
+
+def load_locale():
+    """Translation catalogs and format modules of LANGUAGE_CODE"""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+        formats.get_format('DATE_FORMAT')
+
+
+def prime_lookups():
+    """ContentType cache of every model (admin, permissions, log entries)"""
+    return len(ContentType.objects.get_for_models(*apps.get_models()))
+
+
+def warm_up():
+    """Run every step, return {step: (result, milliseconds)}"""
+    report = {}
+    try:
+        steps = (compile_templates, resolve_urls, import_modules, load_locale, prime_lookups)
+        for step in steps:
+            started = time.perf_counter()
+            result = step()
+            report[step.__name__] = (result, round((time.perf_counter() - started) * 1000, 1))
+    finally:
+        connections.close_all()
+    return report
+
+
+def connect():
+    """Open this worker's connections before its first request"""
+    for alias in connections:
+        connections[alias].ensure_connection()
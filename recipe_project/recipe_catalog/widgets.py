@@ -0,0 +1,43 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompleteSelectMultiple(forms.SelectMultiple):
+    """
+    SelectMultiple for a ModelMultipleChoiceField that renders only the
+    selected options; the rest are fetched by select2 from `url_name`.
+    """
+
+    class Media:
+        # jQuery и select2 из django.contrib.admin: свои копии, без CDN
+        css = {
+            'all': ['admin/css/vendor/select2/select2.min.css'],
+        }
+        js = [
+            'admin/js/vendor/jquery/jquery.min.js',
+            'admin/js/vendor/select2/select2.full.min.js',
+            'recipe_catalog/autocomplete.js',
+        ]
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse(self.url_name)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        all_choices = self.choices
+        selected = [v for v in value if v]
+        try:
+            objects = list(all_choices.queryset.filter(pk__in=selected)) if selected else []
+        except (ValueError, TypeError, ValidationError):
+            objects = []
+        self.choices = [all_choices.choice(obj) for obj in objects]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = all_choices
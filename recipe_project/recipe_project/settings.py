@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'recipe_catalog.middleware.StaticFilesMiddleware',
+    'recipe_catalog.middleware.CompressionMiddleware',
+    'recipe_catalog.middleware.QueryStatsMiddleware',
+    'recipe_catalog.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,12 +60,22 @@ ROOT_URLCONF = 'recipe_project.urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
 
+# Отступы и пустые строки HTML-шаблонов убираются один раз, при компиляции
+# (recipe_catalog.template_loaders)
+TEMPLATE_MINIFY = os.environ.get('TEMPLATE_MINIFY', '1') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_MINIFY:
+    TEMPLATE_LOADERS = [('recipe_catalog.template_loaders.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -72,6 +87,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'recipe_project.wsgi.application'
+ASGI_APPLICATION = 'recipe_project.asgi.application'
+# Route index / recipe / ingredients pages to recipe_catalog.async_views;
+# set by the ASGI profile (docker-compose.asgi.yml)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
 
 
 # Database
@@ -84,6 +103,135 @@ DATABASES = {
     }
 }
 
+# Tuned SQLite (recipe_catalog/sqlite.py): pragmas run on every new
+# connection, connections live across requests and are checked before reuse.
+# SQLITE_TUNED=0 returns to SQLite defaults and a connection per request.
+# WAL is written into the database file and leaves -wal/-shm files next to
+# it, so the db2.sqlite3 checked into the repo keeps its rollback journal:
+# deployments turn WAL on with SQLITE_WAL=1 (docker-compose.yml)
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', '1') == '1'
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '0') == '1'
+SQLITE_PRAGMAS = [
+    # Первым: следующие прагмы тоже могут ждать блокировку
+    ('busy_timeout', 5000),
+    ('cache_size', -64000),  # KiB
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+] if SQLITE_TUNED else []
+if SQLITE_TUNED and SQLITE_WAL:
+    SQLITE_PRAGMAS[1:1] = [
+        # Читатели не ждут писателя; режим хранится в самом файле базы
+        ('journal_mode', 'WAL'),
+        # В WAL fsync только на checkpoint: коммит не теряет целостность
+        ('synchronous', 'NORMAL'),
+    ]
+if SQLITE_TUNED:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas of the catalog tables (recipe_catalog/routers.py). Local
+# stand-in: SQLITE_REPLICA names a read-only copy of the database kept up to
+# date by `manage.py sync_replica --interval N`.
+DATABASE_REPLICAS = []
+SQLITE_REPLICA = os.environ.get('SQLITE_REPLICA')
+if SQLITE_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{SQLITE_REPLICA}?mode=ro',
+        # sync_replica подменяет файл целиком: долгое соединение читало бы старый
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['recipe_catalog.routers.ReplicaRouter']
+# How long a client reads only from the primary after writing catalog data,
+# and the most a replica may lag (pages read from it are cached no longer)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 30))
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 15))
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+TESTING = sys.argv[1:2] == ['test']
+
+# Rendered catalog pages (recipe_catalog.cache): VIEW_CACHE_BACKEND is one of
+# locmem, file, memcached, redis, dummy; VIEW_CACHE_LOCATION overrides LOCATION.
+# A write invalidates pages by bumping versions in this cache, so every worker
+# must see the same cache: file (one host), memcached or redis. locmem is per
+# process and fits only a single worker (runserver)
+VIEW_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'recipe-views'),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379'),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', ''),
+}
+# Тесты смотрят response.context, поэтому по умолчанию страницы в них не кешируются
+VIEW_CACHE_BACKEND = os.environ.get(
+    'VIEW_CACHE_BACKEND', 'dummy' if TESTING else 'file'
+)
+SHARED_CACHE_BACKENDS = ('file', 'memcached', 'redis')
+VIEW_CACHE_ALIAS = 'views'
+VIEW_CACHE_TIMEOUT = int(os.environ.get('VIEW_CACHE_TIMEOUT', 60 * 60))
+# Изменилось больше рецептов: сбрасываются страницы всех рецептов одним ключом
+VIEW_CACHE_BULK_INVALIDATION = 1000
+
+# Sessions (cached_db) and users of logged-in requests (recipe_catalog.auth):
+# SESSION_CACHE_BACKEND takes the same names as VIEW_CACHE_BACKEND. A logout,
+# password change or deactivation must reach every worker at once, so both
+# are cached only in a cache the workers share (file, memcached, redis).
+# With the per-process default sessions live in the database and users are
+# not cached; SESSION_BACKEND and AUTH_USER_CACHE_TIMEOUT override this
+SESSION_CACHE_BACKEND = os.environ.get(
+    'SESSION_CACHE_BACKEND', 'dummy' if TESTING else 'locmem'
+)
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CACHE_SHARED = SESSION_CACHE_BACKEND in SHARED_CACHE_BACKENDS
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get(
+    'AUTH_USER_CACHE_TIMEOUT', 60 if SESSION_CACHE_SHARED else 0
+))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    VIEW_CACHE_ALIAS: {
+        'BACKEND': VIEW_CACHE_BACKENDS[VIEW_CACHE_BACKEND][0],
+        'LOCATION': os.environ.get(
+            'VIEW_CACHE_LOCATION', VIEW_CACHE_BACKENDS[VIEW_CACHE_BACKEND][1]
+        ),
+        'TIMEOUT': VIEW_CACHE_TIMEOUT,
+        # Файловый кеш по умолчанию чистит треть записей уже после 300
+        **({'OPTIONS': {'MAX_ENTRIES': 20000}} if VIEW_CACHE_BACKEND == 'file' else {}),
+    },
+    SESSION_CACHE_ALIAS: {
+        'BACKEND': VIEW_CACHE_BACKENDS[SESSION_CACHE_BACKEND][0],
+        # Своё хранилище: clear() кеша страниц не разлогинивает
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', {
+            'locmem': 'recipe-sessions',
+            'file': os.path.join(BASE_DIR, 'cache', 'sessions'),
+        }.get(SESSION_CACHE_BACKEND, VIEW_CACHE_BACKENDS[SESSION_CACHE_BACKEND][1])),
+        'KEY_PREFIX': 'sessions',
+    },
+}
+
+# cached_db читает сессию из кеша и пишет в БД только при изменении;
+# signed_cookies не обращается ни к БД, ни к кешу
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get(
+    'SESSION_BACKEND', 'cached_db' if SESSION_CACHE_SHARED else 'db'
+)
+# Сессии хранят путь бэкенда, которым вошли: ModelBackend остаётся в списке,
+# чтобы сессии, открытые до CachedModelBackend, не разлогинились
+AUTHENTICATION_BACKENDS = [
+    'recipe_catalog.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -120,19 +268,106 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# Результат collectstatic; исходники лежат в assets/ и static/ приложений
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
-# STATICFILES_DIRS = [
-#     STATIC_ROOT
-# ]
+STATICFILES_DIRS = [
+    BASE_DIR / 'assets',
+]
+# collectstatic names files by content hash and writes .gz/.br copies
+# (recipe_catalog.storage); until it has run, URLs stay unhashed.
+# STATIC_MANIFEST=0 (the default in tests) uses plain StaticFilesStorage
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST', '0' if TESTING else '1') == '1'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'recipe_catalog.storage.CompressedManifestStaticFilesStorage'
+            if STATIC_MANIFEST else
+            'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+# Without nginx in front, recipe_catalog.middleware.StaticFilesMiddleware
+# serves STATIC_ROOT itself; unhashed names are cached for STATIC_MAX_AGE
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '1') == '1'
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 60 * 10))
+
+# recipe_catalog.middleware.CompressionMiddleware: smaller bodies fit in a
+# TCP segment or two anyway and are sent as they are
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_CONTENT_TYPES = {
+    'text/html',
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Behind nginx Django only authorizes media requests and hands the file
+# over with X-Accel-Redirect to this internal location (see nginx.conf)
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT') == '1'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Widths (px) of resized copies generated for every Recipe.image
+IMAGE_VARIANT_WIDTHS = (320, 640, 1024)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Per-request SQL stats (recipe_catalog.middleware.QueryStatsMiddleware):
+# share of requests instrumented, and how often one query shape may run
+# per request before it counts as an N+1 (warning, or an error in tests)
+SQL_STATS_SAMPLE_RATE = float(
+    os.environ.get('SQL_STATS_SAMPLE_RATE', '1' if DEBUG or TESTING else '0.05')
+)
+SQL_DUPLICATE_THRESHOLD = int(os.environ.get('SQL_DUPLICATE_THRESHOLD', 10))
+SQL_DUPLICATE_RAISE = TESTING
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'recipe_catalog.sql': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Release identifier, part of every ETag so a deploy revalidates pages
+RELEASE = os.environ.get('RELEASE', '')
+
+# Recipes per page on the index
+OBJS_ON_PAGE = 10
+# Results shown by full-text search
+SEARCH_RESULTS_LIMIT = 50
+# "What can I cook?" (recipe_catalog/pantry.py): results, most missing
+# ingredients allowed, changed recipes kept aside before the in-memory
+# index is rebuilt, how often it looks for changes and how far back
+# (longer than any transaction and the replica lag)
+PANTRY_RESULTS_LIMIT = 50
+PANTRY_MAX_MISSING = 3
+PANTRY_OVERLAY_LIMIT = 5000
+PANTRY_SYNC_SECONDS = 5
+PANTRY_SYNC_SLACK = 60
+# Options per page of the ingredient autocomplete
+AUTOCOMPLETE_PAGE_SIZE = 20
+# Rows per page of the bulk ingredient editor
+INGREDIENTS_BULK_PAGE_SIZE = 100
+# JSON API (recipe_catalog/api.py): page sizes and ?ids= batch limit
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_BATCH_SIZE = 100
+
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/auth/login/'
 LOGOUT_REDIRECT_URL = '/'
@@ -142,4 +377,4 @@ CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SECURE = True
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
-X_FRAME_OPTIONS = 'DENY'
\ No newline at end of file
+X_FRAME_OPTIONS = 'DENY'